@@ -20,7 +20,7 @@ Keyword := 'test:' 'prepare:' '>>>' 'title:'
 NoSwitch ::= ~Keyword
 Doctest ::= [(~'title:')* 'title:' name=(~NL)+]
             [(~'prepare:')* 'prepare:' (NoSwitch* '>>>' prepare_lines<<((~NL)*) NL+)*]
-            (~'test:')* 'test:' (NoSwitch* '>>>' test_lines<<((~NL)+))* 
+            (~'test:')* 'test:' (NoSwitch* '>>>' test_lines<<((~NL)*))* 
             ->
               prepare_lines = recover_codes(sum(prepare_lines, [])) if prepare_lines else ''
               test          = recover_codes(sum(test_lines, []))    if test_lines else ''
@@ -0,0 +1,75 @@
+"""
+helpers shared by the benchmarks, imported as `_common` from the scripts of this
+directory.
+"""
+import os
+import time
+import types
+
+skipped_dirs = ('test', 'tests', 'site-packages')
+
+
+def collect_filenames(paths, skipped=skipped_dirs):
+    """
+    the .py files under `paths` in a stable order, skipping the directories named in
+    `skipped`.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(each for each in dirs if each not in skipped)
+            yield from (os.path.join(root, each) for each in sorted(files) if each.endswith('.py'))
+
+
+def collect_sources(paths, check=None, errors=(), limit=None, skipped=skipped_dirs):
+    """
+    (filename, source) of the files of `collect_filenames` which decode as UTF-8 and which
+    `check(source)` accepts without raising one of `errors`, at most `limit` of them
+    unless `limit` is 0 or None.
+    """
+    errors = (UnicodeDecodeError, *errors)
+    count = 0
+    for filename in collect_filenames(paths, skipped):
+        if limit and count == limit:
+            return
+        try:
+            with open(filename, encoding='utf-8') as fr:
+                source = fr.read()
+            if check is not None:
+                check(source)
+        except errors:
+            continue
+        count += 1
+        yield filename, source
+
+
+def best_of(runs, fn, prepare=None):
+    """
+    the least seconds of `fn()` over `runs` runs, or of `fn(prepare())` where `prepare`
+    is not measured.
+    """
+    best = float('inf')
+    for _ in range(runs):
+        if prepare is None:
+            start = time.perf_counter()
+            fn()
+        else:
+            arg = prepare()
+            start = time.perf_counter()
+            fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def code_fields(code: types.CodeType) -> tuple:
+    """
+    the fields of `code` and of its nested code objects, `marshal.dumps` being sensitive
+    to the reference counts of the constants.
+    """
+    return (code.co_code, code.co_names, code.co_varnames, code.co_freevars,
+            code.co_cellvars, code.co_flags, code.co_argcount, code.co_kwonlyargcount,
+            code.co_stacksize, code.co_lnotab, code.co_name,
+            tuple(code_fields(each) if isinstance(each, types.CodeType) else each
+                  for each in code.co_consts))
@@ -0,0 +1,120 @@
+"""
+per-node dispatch overhead of `py_emit`, `type_dispatch` against `Redy.Magic.Pattern`.
+
+    python benchmarks/emit_dispatch.py [-runs 5] [-limit 30] [files or directories...]
+
+The nodes of the stdlib sources are dispatched to handlers doing nothing, registered
+for the same types as the handlers of `py_emit`, then the sources are emitted with the
+real handlers registered to each dispatcher, whose code objects are checked to be
+identical.
+"""
+import argparse
+import ast
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Redy.Magic.Pattern import Pattern  # noqa: E402
+from _common import best_of, code_fields, collect_sources  # noqa: E402
+from yapypy.extended_python import profiling  # noqa: E402
+from yapypy.extended_python.pybc_emit import py_emit  # noqa: E402
+from yapypy.extended_python.py_compile import py_compile  # noqa: E402
+from yapypy.utils.type_dispatch import type_dispatch  # noqa: E402
+
+
+def make_pattern(handlers):
+
+    @Pattern
+    def dispatch(node, ctx):
+        return type(node)
+
+    for cls, handler in handlers.items():
+        dispatch.case(cls)(handler)
+    return dispatch
+
+
+def make_type_dispatch(handlers):
+
+    @type_dispatch
+    def dispatch(node, ctx):
+        return type(node)
+
+    for cls, handler in handlers.items():
+        dispatch.case(cls)(handler)
+    return dispatch
+
+
+dispatchers = {'Pattern': make_pattern, 'type_dispatch': make_type_dispatch}
+
+
+def swap_py_emit(dispatch):
+    """
+    bind `py_emit` to `dispatch` in every module emitting with it, return the old one.
+    """
+    old = sys.modules['yapypy.extended_python.pybc_emit'].py_emit
+    for name, module in list(sys.modules.items()):
+        if name.startswith('yapypy.extended_python') and getattr(module, 'py_emit', None) is old:
+            module.py_emit = dispatch
+    return old
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('-runs', type=int, default=5)
+    arg_parser.add_argument('-limit', type=int, default=30)
+    arg_parser.add_argument('paths', nargs='*', default=[os.path.dirname(ast.__file__)])
+    args = arg_parser.parse_args()
+
+    def emits(source):
+        py_compile(ast.parse(source))
+
+    sources = list(collect_sources(args.paths, emits, (Exception, ), args.limit))
+
+    handlers = py_emit.handlers
+    nodes = [
+        node for _, source in sources for node in ast.walk(ast.parse(source))
+        if type(node) in handlers
+    ]
+
+    def nothing(node, ctx):
+        pass
+
+    def direct():
+        for node in nodes:
+            nothing(node, None)
+
+    baseline = best_of(args.runs, direct)
+    print(f'{len(nodes)} nodes from {len(sources)} files, '
+          f'{baseline / len(nodes) * 1e9:.0f}ns per direct call')
+    print(f'{"dispatcher":16}{"ns/node":>10}{"py_emit":>10}')
+
+    fields = {}
+    for name, make in dispatchers.items():
+        dispatch = make(dict.fromkeys(handlers, nothing))
+
+        def dispatch_all():
+            for node in nodes:
+                dispatch(node, None)
+
+        overhead = (best_of(args.runs, dispatch_all) - baseline) / len(nodes) * 1e9
+
+        old = swap_py_emit(make(handlers))
+        try:
+            best_emit = float('inf')
+            for _ in range(args.runs):
+                codes = []
+                with profiling.Profile() as profile:
+                    for filename, source in sources:
+                        codes.append(py_compile(ast.parse(source), filename))
+                best_emit = min(best_emit, profile.summary()['py_emit'].seconds)
+        finally:
+            swap_py_emit(old)
+        fields[name] = [code_fields(each) for each in codes]
+        print(f'{name:16}{overhead:10.0f}{best_emit:9.3f}s')
+
+    assert fields['Pattern'] == fields['type_dispatch'], 'the dispatchers emit different code'
+
+
+if __name__ == '__main__':
+    main()
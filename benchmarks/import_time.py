@@ -0,0 +1,65 @@
+"""
+import-time budget of the yapypy command line.
+
+    python benchmarks/import_time.py [-budget 500] [-runs 5] [-module yapypy.cmd.cli]
+
+Each run imports `module` in a fresh interpreter under `python -X importtime`, the
+fastest run is compared against the budget(in milliseconds). The first import which
+builds the cached grammar is not measured.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+_line = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str):
+    """
+    return [(module name, self microseconds, cumulative microseconds)] of one import of
+    `module`, in the order `-X importtime` reports them.
+    """
+    env = {**os.environ, 'PYTHONPATH': _root}
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          stderr=subprocess.PIPE,
+                          env=env,
+                          universal_newlines=True,
+                          check=True)
+    records = []
+    for line in proc.stderr.splitlines():
+        matched = _line.match(line)
+        if matched:
+            self_us, cumulative_us, _, name = matched.groups()
+            records.append((name, int(self_us), int(cumulative_us)))
+    return records
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('-module', default='yapypy.cmd.cli')
+    arg_parser.add_argument('-budget', type=float, default=500, help='milliseconds')
+    arg_parser.add_argument('-runs', type=int, default=5)
+    arg_parser.add_argument('-top', type=int, default=10)
+    args = arg_parser.parse_args()
+
+    # warm up, the grammar cache is written by the first import.
+    import_times(args.module)
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda records: records[-1][2])
+    total_ms = best[-1][2] / 1000
+
+    print(f'{args.module}: {total_ms:.1f}ms (best of {args.runs}, budget {args.budget}ms)')
+    print('slowest modules by self time:')
+    for name, self_us, cumulative_us in sorted(best, key=lambda each: -each[1])[:args.top]:
+        print(f'  {self_us / 1000:8.1f}ms {cumulative_us / 1000:8.1f}ms  {name}')
+
+    assert total_ms <= args.budget, f'import time {total_ms:.1f}ms exceeds {args.budget}ms'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+lexing microbenchmark over the stdlib.
+
+    python benchmarks/lex_throughput.py [-runs 3] [-limit 200] [files or directories...]
+
+Measures converting tokenized sources to rbnf tokens with `parser.to_rbnf_token`
+against the lookup-per-token conversion it replaced, and the whole `parser.lex`.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import best_of, collect_sources  # noqa: E402
+from yapypy.extended_python import parser  # noqa: E402
+from yapypy.extended_python.parser import Tokenizer, cast, kwlist, tokenize  # noqa: E402
+
+
+def lookup_per_token(tk):
+    # `to_rbnf_token` before the interning table.
+    name = cast(tokenize.tok_name[tk.type])
+    if name == 'NAME' and tk.string in kwlist:
+        value = cast(tk.string)
+        name = cast('KEYWORD')
+    else:
+        value = cast(tk.string) if name not in ('NAME', 'STRING', 'NUMBER') else tk.string
+    return Tokenizer(name, value, *tk.start)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('paths', nargs='*', default=[os.path.dirname(os.__file__)])
+    arg_parser.add_argument('-runs', type=int, default=3)
+    arg_parser.add_argument('-limit', type=int, default=200, help='max number of files')
+    args = arg_parser.parse_args()
+
+    def lexes(source):
+        list(parser.lex(source))
+
+    sources = [
+        source for _, source in collect_sources(
+            args.paths, lexes, (SyntaxError, tokenize.TokenError), args.limit, skipped=())
+    ]
+    token_infos = [
+        tk for source in sources for tk in parser.generate_tokens_from_source(source)
+        if parser.not_to_ignore(tk)
+    ]
+    assert list(map(parser.to_rbnf_token, token_infos)) == list(
+        map(lookup_per_token, token_infos))
+
+    print(f'{len(sources)} files, {len(token_infos)} tokens')
+    for name, fn in [
+        ('lookup per token', lambda: list(map(lookup_per_token, token_infos))),
+        ('to_rbnf_token', lambda: list(map(parser.to_rbnf_token, token_infos))),
+        ('lex', lambda: [each for source in sources for each in parser.lex(source)]),
+    ]:
+        elapsed = best_of(args.runs, fn)
+        print(f'{name:20} {elapsed:7.3f}s {len(token_infos) / elapsed:12,.0f} tokens/s')
+
+
+if __name__ == '__main__':
+    main()
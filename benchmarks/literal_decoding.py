@@ -0,0 +1,82 @@
+"""
+literal decoding microbenchmark on a literal-dense corpus.
+
+    python benchmarks/literal_decoding.py [-runs 3] [-rows 500]
+
+The corpus is a generated module of constant tables: integers in every base, floats,
+complex numbers, strings with and without escapes, bytes and named constants.
+`literals.decode_number` and `literals.decode_string` are compared with the `eval` and
+`ast.parse` calls they replaced, then the whole corpus is parsed.
+"""
+import argparse
+import ast
+import io
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import best_of  # noqa: E402
+from yapypy.extended_python import literals  # noqa: E402
+from yapypy.extended_python.parser import parse, tokenize  # noqa: E402
+
+
+def make_corpus(rows: int, seed: int = 42) -> str:
+    rand = random.Random(seed)
+    makers = [
+        lambda: str(rand.randrange(10**9)),
+        lambda: hex(rand.randrange(2**32)),
+        lambda: f'0o{rand.randrange(8**8):o}',
+        lambda: f'{rand.randrange(10**6):_}',
+        lambda: repr(rand.random() * 10**rand.randrange(-5, 5)),
+        lambda: f'{rand.random():.3f}j',
+        lambda: repr(''.join(rand.choice('abc xyz') for _ in range(12))),
+        lambda: repr('tab\tnewline\nquote\'' + chr(rand.randrange(0x80, 0x100))),
+        lambda: repr(bytes(rand.randrange(256) for _ in range(8))),
+        lambda: rand.choice(['True', 'False', 'None']),
+    ]
+    lines = ['TABLE = [']
+    lines.extend(f'    ({", ".join(maker() for maker in makers)}),' for _ in range(rows))
+    lines.append(']')
+    return '\n'.join(lines) + '\n'
+
+
+def old_number(text):
+    return eval(text)
+
+
+def old_string(text):
+    return ast.parse(text).body[0].value
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('-runs', type=int, default=3)
+    arg_parser.add_argument('-rows', type=int, default=500)
+    args = arg_parser.parse_args()
+
+    corpus = make_corpus(args.rows)
+    tokens = list(tokenize.generate_tokens(io.StringIO(corpus).readline))
+    numbers = [tk.string for tk in tokens if tk.type == tokenize.NUMBER]
+    strings = [tk.string for tk in tokens if tk.type == tokenize.STRING]
+    assert list(map(literals.decode_number, numbers)) == list(map(old_number, numbers))
+    assert list(map(ast.dump, map(literals.decode_string, strings))) == list(
+        map(ast.dump, map(old_string, strings)))
+
+    print(f'{len(corpus)} bytes, {len(numbers)} numbers, {len(strings)} strings')
+    for name, literal_tokens, fn in [
+        ('eval', numbers, old_number),
+        ('decode_number', numbers, literals.decode_number),
+        ('ast.parse', strings, old_string),
+        ('decode_string', strings, literals.decode_string),
+    ]:
+        elapsed = best_of(args.runs, lambda: list(map(fn, literal_tokens)))
+        print(f'{name:20} {elapsed:7.3f}s {len(literal_tokens) / elapsed:12,.0f} literals/s')
+
+    elapsed = best_of(1, lambda: parse(corpus))
+    print(f'{"parse":20} {elapsed:7.3f}s {len(corpus) / elapsed:12,.0f} bytes/s')
+
+
+if __name__ == '__main__':
+    main()
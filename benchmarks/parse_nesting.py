@@ -0,0 +1,59 @@
+"""
+parse time of deeply nested expressions, with and without packrat memoization.
+
+    python benchmarks/parse_nesting.py [-runs 3] [-depths 2 4 6 8 10 12 16 32] [-timeout 1]
+
+Each kind of nesting is parsed at growing depths, the unmemoized parser is no longer
+measured at greater depths once it takes more than `-timeout` seconds.
+"""
+import argparse
+import ast
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import best_of  # noqa: E402
+from yapypy.extended_python.parser import parse  # noqa: E402
+
+nestings = {
+    'call': lambda depth: 'f(' * depth + 'x' + ')' * depth,
+    'keyword call': lambda depth: 'f(k=' * depth + 'x' + ')' * depth,
+    'dict': lambda depth: '{1: ' * depth + 'x' + '}' * depth,
+    'set': lambda depth: '{' * depth + 'x' + '}' * depth,
+    'list': lambda depth: '[' * depth + 'x' + ']' * depth,
+    'parenthesized': lambda depth: '(' * depth + 'x' + ')' * depth,
+    'subscript': lambda depth: 'a[' * depth + 'x' + ']' * depth,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('-runs', type=int, default=3)
+    arg_parser.add_argument('-depths', type=int, nargs='+', default=[2, 4, 6, 8, 10, 12, 16, 32])
+    arg_parser.add_argument('-timeout', type=float, default=1)
+    args = arg_parser.parse_args()
+
+    # the parser recurses a few hundred frames per level of nesting.
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 1000 * max(args.depths)))
+
+    print(f'{"":24}' + ''.join(f'{depth:>16}' for depth in args.depths))
+    for name, make in nestings.items():
+        dumps = {}
+        for memo in (True, False):
+            row = []
+            for depth in args.depths:
+                if row and row[-1] > args.timeout:
+                    break
+                source = f'y = {make(depth)}\n'
+                result = parse(source, memo=memo)
+                assert result.state.end_index == len(result.tokens), (name, depth)
+                # the same AST with or without memoization.
+                assert dumps.setdefault(depth, ast.dump(result.result)) == ast.dump(result.result)
+                row.append(best_of(args.runs, lambda: parse(source, memo=memo)))
+            label = f'{name}{"" if memo else "(no memo)"}'
+            print(f'{label:24}' + ''.join(f'{elapsed:15.3f}s' for elapsed in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+cost of the `SymTable` and `Context` records, list-backed or slotted, during `py_emit`.
+
+    python benchmarks/record_access.py [-runs 3] [-limit 30] [-n 200000]
+                                       [files or directories...]
+
+The records are built with `as_slots`. Twins of them built with `as_namedlist` from the
+same classes are swapped in to compare: first the construction and the attribute reads
+and writes alone, then tagging and emitting the stdlib with each kind of records, whose
+code objects are checked to be identical.
+"""
+import argparse
+import ast
+import os
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import best_of, code_fields, collect_sources  # noqa: E402
+from bytecode import Bytecode  # noqa: E402
+from yapypy.extended_python import profiling, pybc_emit, symbol_analyzer  # noqa: E402
+from yapypy.extended_python.py_compile import py_compile  # noqa: E402
+from yapypy.utils.namedlist import as_namedlist, trait  # noqa: E402
+
+py_compile_module = sys.modules['yapypy.extended_python.py_compile']
+
+
+def list_backed(cls):
+    excluded = {*cls.__slots__, '__slots__', '__init__', '__str__', '__dict__', '__weakref__'}
+    namespace = {k: v for k, v in vars(cls).items() if k not in excluded}
+    return trait(as_namedlist)(cls.__name__, (list, ), namespace)
+
+
+kinds = {
+    'slots': (symbol_analyzer.SymTable, pybc_emit.Context),
+    'namedlist': (list_backed(symbol_analyzer.SymTable), list_backed(pybc_emit.Context)),
+}
+
+
+@contextmanager
+def records(kind):
+    sym_table, context = kinds[kind]
+    saved = symbol_analyzer.SymTable, pybc_emit.Context, py_compile_module._non_ctx
+    symbol_analyzer.SymTable, pybc_emit.Context = sym_table, context
+    py_compile_module._non_ctx = context(
+        bc=Bytecode(), sym_tb=None, parent=None, current_block_stack=[], cts=frozenset(),
+        names={})
+    try:
+        yield
+    finally:
+        symbol_analyzer.SymTable, pybc_emit.Context, py_compile_module._non_ctx = saved
+
+
+def micro(kind, n, runs):
+    _, context = kinds[kind]
+    ctx = context(bc=Bytecode(), sym_tb=None, parent=None, current_block_stack=[],
+                  cts=frozenset(), names={})
+    indices = range(n)
+
+    def build():
+        for _ in indices:
+            context(bc=None, sym_tb=None, parent=ctx, current_block_stack=[], cts=frozenset(),
+                    names={})
+
+    def read():
+        for _ in indices:
+            ctx.bc, ctx.sym_tb, ctx.parent, ctx.current_block_stack, ctx.cts
+
+    def write():
+        for _ in indices:
+            ctx.parent = ctx
+
+    return [best_of(runs, each) / n * 1e9 for each in (build, read, write)]
+
+
+def emit_all(sources):
+    """
+    seconds of the `to_tagged_ast` and `py_emit` phases over `sources`, and the codes.
+    """
+    codes = []
+    with profiling.Profile() as profile:
+        for filename, source in sources:
+            codes.append(py_compile(ast.parse(source), filename))
+    summary = profile.summary()
+    return summary['to_tagged_ast'].seconds, summary['py_emit'].seconds, codes
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('-runs', type=int, default=3)
+    arg_parser.add_argument('-limit', type=int, default=30)
+    arg_parser.add_argument('-n', type=int, default=200000)
+    arg_parser.add_argument('paths', nargs='*', default=[os.path.dirname(ast.__file__)])
+    args = arg_parser.parse_args()
+
+    print(f'{"records":12}{"build ns":>10}{"read 5 ns":>11}{"write ns":>10}')
+    for kind in kinds:
+        build, read, write = micro(kind, args.n, args.runs)
+        print(f'{kind:12}{build:10.0f}{read:11.0f}{write:10.0f}')
+
+    def emits(source):
+        with records('slots'):
+            py_compile(ast.parse(source))
+
+    sources = list(collect_sources(args.paths, emits, (Exception, ), args.limit))
+
+    print(f'\n{len(sources)} files')
+    print(f'{"records":12}{"to_tagged_ast":>15}{"py_emit":>10}')
+    fields = {}
+    for kind in kinds:
+        best_tag = best_emit = float('inf')
+        with records(kind):
+            for _ in range(args.runs):
+                tag_seconds, emit_seconds, codes = emit_all(sources)
+                best_tag, best_emit = min(best_tag, tag_seconds), min(best_emit, emit_seconds)
+        fields[kind] = [code_fields(each) for each in codes]
+        print(f'{kind:12}{best_tag:14.3f}s{best_emit:9.3f}s')
+
+    assert fields['slots'] == fields['namedlist'], 'the records change the emitted code'
+
+
+if __name__ == '__main__':
+    main()
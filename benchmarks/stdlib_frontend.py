@@ -0,0 +1,159 @@
+"""
+throughput of each phase of the front end over the stdlib.
+
+    python benchmarks/stdlib_frontend.py [-runs 1] [-limit 50] [-json out.json]
+                                         [-compare old.json] [-tolerance 0.2]
+                                         [files or directories...]
+
+Every source is fed through `lex`, `parse`, `to_tagged_ast` and `py_compile` separately,
+and through `ast.parse` and `compile` as the baseline. The tokens, AST nodes and bytes
+processed per second are reported for each phase, and dumped as JSON with `-json`.
+
+With `-compare`, the phases are compared with a JSON dumped before, and the exit code is 1
+if any of them is slower by more than `-tolerance`.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import sys
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import best_of, collect_sources  # noqa: E402
+from yapypy import __version__ as yapypy_version  # noqa: E402
+from yapypy.extended_python.parser import lex, parse  # noqa: E402
+from yapypy.extended_python.py_compile import py_compile  # noqa: E402
+from yapypy.extended_python.symbol_analyzer import to_tagged_ast  # noqa: E402
+
+
+def measure_file(filename, source, runs):
+    """
+    seconds of each phase for `source`, which are measured separately
+    as `to_tagged_ast` modifies the AST it tags.
+    """
+    n_tokens = sum(1 for _ in lex(source))
+    parsed = parse(source)
+    if parsed.state.end_index != len(parsed.tokens):
+        raise SyntaxError(f'{filename} is not parsed completely.')
+    n_nodes = sum(1 for _ in ast.walk(parsed.result))
+
+    def parse_source():
+        return parse(source).result
+
+    def tag_parsed():
+        return to_tagged_ast(parse(source).result)
+
+    seconds = OrderedDict([
+        ('lex', best_of(runs, lambda src: sum(1 for _ in lex(src)), lambda: source)),
+        ('parse', best_of(runs, parse, lambda: source)),
+        ('to_tagged_ast', best_of(runs, to_tagged_ast, parse_source)),
+        ('py_compile', best_of(runs, lambda tag: py_compile(tag, filename), tag_parsed)),
+        ('ast.parse', best_of(runs, ast.parse, lambda: source)),
+        ('compile', best_of(runs, lambda tree: compile(tree, filename, 'exec'),
+                            lambda: ast.parse(source))),
+    ])
+    return n_tokens, n_nodes, seconds
+
+
+def report(sources, runs):
+    totals = OrderedDict()
+    n_tokens = n_nodes = n_bytes = 0
+    files, failures = [], []
+    for filename, source in sources:
+        try:
+            tokens, nodes, seconds = measure_file(filename, source, runs)
+        except Exception as e:
+            failures.append({'file': filename, 'error': f'{type(e).__name__}: {e}'[:200]})
+            continue
+        files.append(filename)
+        n_tokens += tokens
+        n_nodes += nodes
+        n_bytes += len(source.encode())
+        for phase, elapsed in seconds.items():
+            totals[phase] = totals.get(phase, 0) + elapsed
+
+    phases = OrderedDict()
+    for phase, elapsed in totals.items():
+        phases[phase] = OrderedDict([
+            ('seconds', elapsed),
+            ('tokens_per_second', n_tokens / elapsed),
+            ('nodes_per_second', n_nodes / elapsed),
+            ('bytes_per_second', n_bytes / elapsed),
+        ])
+    front_end = sum(totals[each] for each in ('parse', 'to_tagged_ast', 'py_compile'))
+    baseline = totals['ast.parse'] + totals['compile']
+
+    return OrderedDict([
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('yapypy', yapypy_version),
+        ('runs', runs),
+        ('files', len(files)),
+        ('tokens', n_tokens),
+        ('nodes', n_nodes),
+        ('bytes', n_bytes),
+        ('phases', phases),
+        ('slowdown', front_end / baseline),
+        ('failures', failures),
+    ])
+
+
+def print_report(result):
+    print(f'{result["files"]} files, {result["tokens"]} tokens, {result["nodes"]} nodes, '
+          f'{result["bytes"]} bytes, {len(result["failures"])} failed')
+    print(f'{"phase":16}{"seconds":>10}{"tokens/s":>14}{"nodes/s":>14}{"bytes/s":>14}')
+    for phase, each in result['phases'].items():
+        print(f'{phase:16}{each["seconds"]:10.3f}{each["tokens_per_second"]:14,.0f}'
+              f'{each["nodes_per_second"]:14,.0f}{each["bytes_per_second"]:14,.0f}')
+    print(f'parse + to_tagged_ast + py_compile is {result["slowdown"]:.1f}x '
+          f'ast.parse + compile')
+
+
+def compare(result, old, tolerance):
+    """
+    print the throughput of each phase relative to `old`, return the regressed phases.
+    """
+    regressed = []
+    for phase, each in result['phases'].items():
+        if phase not in old['phases']:
+            continue
+        ratio = each['bytes_per_second'] / old['phases'][phase]['bytes_per_second']
+        print(f'{phase:16}{ratio:9.2f}x')
+        if ratio < 1 - tolerance:
+            regressed.append(phase)
+    return regressed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('paths', nargs='*', default=[os.path.dirname(os.__file__)])
+    arg_parser.add_argument('-runs', type=int, default=1)
+    arg_parser.add_argument('-limit', type=int, default=50, help='max number of files, 0 for all')
+    arg_parser.add_argument('-json', help='file to dump the results to')
+    arg_parser.add_argument('-compare', help='results dumped by a previous run')
+    arg_parser.add_argument('-tolerance', type=float, default=0.2)
+    args = arg_parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    sources = list(collect_sources(args.paths, limit=args.limit))
+
+    result = report(sources, args.runs)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as fw:
+            json.dump(result, fw, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fr:
+            old = json.load(fr)
+        regressed = compare(result, old, args.tolerance)
+        if regressed:
+            print(f'regressed: {", ".join(regressed)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+tokenizer throughput in tokens per second.
+
+    python benchmarks/tokenize_throughput.py [-runs 3] [files or directories...]
+
+Compares the stdlib `tokenize`, the vendored `generate_tokens` and its fast path
+`generate_tokens_from_source` on the given sources(the stdlib by default), and checks
+that the fast path yields exactly the same tokens.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tokenize as std_tokenize
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import collect_sources  # noqa: E402
+
+if sys.version_info >= (3, 7):
+    import yapypy.utils.yapypy_tokenize37 as yapypy_tokenize
+else:
+    import yapypy.utils.yapypy_tokenize36 as yapypy_tokenize
+
+
+def measure(tokenizer, sources, runs):
+    best = float('inf')
+    n_tokens = 0
+    for _ in range(runs):
+        n_tokens = 0
+        start = time.perf_counter()
+        for source in sources:
+            for _ in tokenizer(source):
+                n_tokens += 1
+        best = min(best, time.perf_counter() - start)
+    return n_tokens, best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('paths', nargs='*', default=[os.path.dirname(os.__file__)])
+    arg_parser.add_argument('-runs', type=int, default=3)
+    arg_parser.add_argument('-limit', type=int, default=200, help='max number of files')
+    args = arg_parser.parse_args()
+
+    def tokenizes(source):
+        list(yapypy_tokenize.generate_tokens(io.StringIO(source).readline))
+
+    sources = [
+        source for _, source in collect_sources(
+            args.paths, tokenizes, (SyntaxError, yapypy_tokenize.TokenError), args.limit,
+            skipped=())
+    ]
+
+    for source in sources:
+        expected = list(yapypy_tokenize.generate_tokens(io.StringIO(source).readline))
+        assert list(yapypy_tokenize.generate_tokens_from_source(source)) == expected
+
+    tokenizers = [
+        ('stdlib tokenize', lambda source: std_tokenize.generate_tokens(
+            io.StringIO(source).readline)),
+        ('generate_tokens', lambda source: yapypy_tokenize.generate_tokens(
+            io.StringIO(source).readline)),
+        ('generate_tokens_from_source', yapypy_tokenize.generate_tokens_from_source),
+    ]
+    print(f'{len(sources)} files')
+    for name, tokenizer in tokenizers:
+        n_tokens, elapsed = measure(tokenizer, sources, args.runs)
+        print(f'{name:30} {n_tokens:9} tokens {elapsed:7.3f}s '
+              f'{n_tokens / elapsed:12,.0f} tokens/s')
+
+
+if __name__ == '__main__':
+    main()
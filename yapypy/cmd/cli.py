@@ -1,40 +1,58 @@
+import json
 import marshal
 import os
 import struct
+import sys
 import time
-from importlib._bootstrap_external import MAGIC_NUMBER
+# imported before `pycompat` installs its finder, which would compile the modules
+# the worker processes need(`selectors` fails to) on the first `-jobs` run.
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import MAGIC_NUMBER, cache_from_source, decode_source
 from Redy.Tools.PathLib import Path
-from rbnf.edsl.rbnf_analyze import check_parsing_complete
 from wisepy.talking import Talking
-from yapypy.extended_python import pycompat
+from yapypy.extended_python import profiling, pycompat
+from yapypy.extended_python.bytecode_cache import source_hash, write_atomic
+from yapypy.extended_python.compile_cache import code_cache, source_key
+from yapypy.extended_python.parser import fix_grammar, note_parsed, stage_grammar_bytes
 from yapypy.extended_python.parser import parse as parse_ext_py
 from yapypy.extended_python.py_compile import py_compile
 
+if sys.version_info >= (3, 7):
+    from importlib.util import source_hash as importlib_source_hash
+
 python_ex = Talking()
 
 
-def compile_ex_python_from_filename(filename, is_entry_point=True):
-    with Path(filename).open('r') as fr:
-        source_code = fr.read()
-        result = parse_ext_py(source_code)
-    result.state.filename = filename
-    # double check parsed result.
-    check_parsing_complete(source_code, result.tokens, result.state)
-    ast = result.result
-    code = py_compile(ast, filename, is_entrypoint=is_entry_point)
+def _compile_source(source_code, filename, is_entry_point):
+    key = source_key(source_code, filename, is_entry_point)
+    code = code_cache.get(key)
+    if code is None:
+        code = _compile_source_uncached(source_code, filename, is_entry_point)
+        code_cache.put(key, code)
     return code
 
 
-def compile_ex_python_from_source(source_code, is_entry_point=True):
-    filename = '<unknown>'
-    result = parse_ext_py(source_code)
-    result.state.filename = filename
-    check_parsing_complete(source_code, result.tokens, result.state)
+def _compile_source_uncached(source_code, filename, is_entry_point):
+    note_parsed(len(source_code))
+    with profiling.phase('parse', filename) as record:
+        result = parse_ext_py(source_code, filename)
+    if profiling.enabled():
+        record.count(bytes=len(source_code), nodes=profiling.count_nodes(result.result))
     ast = result.result
     code = py_compile(ast, filename, is_entrypoint=is_entry_point)
     return code
 
 
+def compile_ex_python_from_filename(filename, is_entry_point=True):
+    with Path(filename).open('r') as fr:
+        source_code = fr.read()
+    return _compile_source(source_code, filename, is_entry_point)
+
+
+def compile_ex_python_from_source(source_code, is_entry_point=True):
+    return _compile_source(source_code, '<unknown>', is_entry_point)
+
+
 @python_ex
 def run(filename: str = None, c: str = None):
     """
@@ -50,19 +68,421 @@ def run(filename: str = None, c: str = None):
     exec(code, {})
 
 
+def _marshal_compiled(filename):
+    # runs in worker processes, code objects are sent back marshalled, with the hash of
+    # the very bytes compiled. Each source of a batch is compiled once, so `code_cache`
+    # would only keep the code objects alive.
+    with open(filename, 'rb') as fr:
+        source_bytes = fr.read()
+    code = _compile_source_uncached(decode_source(source_bytes), filename, True)
+    with profiling.phase('marshal', filename):
+        return source_hash(source_bytes).hex(), marshal.dumps(code)
+
+
+# flags of PEP 552 headers
+_INVALIDATION_FLAGS = {'timestamp': 0b00, 'unchecked-hash': 0b01, 'checked-hash': 0b11}
+
+_uint32 = struct.Struct('<I')
+
+_pyc_header_size = 16 if sys.version_info >= (3, 7) else 12
+
+
+def _pyc_path(filename):
+    return cache_from_source(os.path.abspath(filename))
+
+
+def _pack_pyc_header(filename, st: os.stat_result, invalidation='timestamp'):
+    """
+    the header importlib validates before loading a .pyc, see PEP 552.
+
+    title: importlib loadable pyc
+    prepare:
+    >>> import importlib, os, sys, tempfile
+    >>> from yapypy.extended_python import pycompat
+    >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+    >>> from yapypy.cmd import cli
+    test:
+    >>> tmp = tempfile.mkdtemp()
+    >>> sys.path.insert(0, tmp)
+    >>> try:
+    >>>     for mode, flags in cli._INVALIDATION_FLAGS.items():
+    >>>         name = 'yapypy_pyc_' + mode.replace('-', '_')
+    >>>         filename = os.path.join(tmp, name + '.py')
+    >>>         with open(filename, 'w') as fw:
+    >>>             fw.write('value = (answer := 42)')
+    >>>         cli._compile(filename, invalidation=mode)
+    >>>         with open(cli._pyc_path(filename), 'rb') as fr:
+    >>>             header = fr.read(16)
+    >>>         assert header == cli._pack_pyc_header(filename, os.stat(filename), mode)
+    >>>         assert header[4:8] == bytes([flags, 0, 0, 0])
+    >>>         # CPython 3.7 can not compile the source, the module comes from the .pyc.
+    >>>         assert importlib.import_module(name).answer == 42
+    >>> finally:
+    >>>     sys.path.remove(tmp)
+    """
+    flags = _INVALIDATION_FLAGS[invalidation]
+    mtime_and_size = _uint32.pack(int(st.st_mtime) & 0xFFFFFFFF) + _uint32.pack(
+        st.st_size & 0xFFFFFFFF)
+
+    if sys.version_info < (3, 7):
+        if flags:
+            raise ValueError('hash-based pycs require Python 3.7+.')
+        return MAGIC_NUMBER + mtime_and_size
+
+    if flags:
+        with open(filename, 'rb') as fr:
+            return MAGIC_NUMBER + _uint32.pack(flags) + importlib_source_hash(fr.read())
+
+    return MAGIC_NUMBER + _uint32.pack(flags) + mtime_and_size
+
+
+def _check_invalidation(invalidation):
+    # before compiling anything, `_pack_pyc_header` raises once the sources compiled.
+    if invalidation not in _INVALIDATION_FLAGS:
+        raise ValueError(f'unknown invalidation mode {invalidation!r}.')
+    if _INVALIDATION_FLAGS[invalidation] and sys.version_info < (3, 7):
+        raise ValueError('hash-based pycs require Python 3.7+.')
+
+
+def _write_pyc(filename, st: os.stat_result, marshalled_code_object, invalidation):
+    header = _pack_pyc_header(filename, st, invalidation)
+    write_atomic(_pyc_path(filename), header + marshalled_code_object)
+
+
+def _pyc_header_matches(filename, st: os.stat_result, invalidation):
+    try:
+        with open(_pyc_path(filename), 'rb') as fr:
+            header = fr.read(_pyc_header_size)
+    except OSError:
+        return False
+    return header == _pack_pyc_header(filename, st, invalidation)
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r') as fr:
+            return json.load(fr)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest_path, manifest):
+    write_atomic(manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode())
+
+
+def _read_source_hash(filename):
+    with open(filename, 'rb') as fr:
+        return source_hash(fr.read()).hex()
+
+
+def _is_up_to_date(filename, st: os.stat_result, manifest: dict, invalidation):
+    """
+    whether the .pyc of `filename` is up to date, checked with the `manifest` entry of
+    `filename` if any, or else with the header of the .pyc.
+
+    title: incremental compile
+    prepare:
+    >>> import os, sys, tempfile
+    >>> from yapypy.extended_python import profiling, pycompat
+    >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+    >>> from yapypy.cmd import cli
+    test:
+    >>> tmp = tempfile.mkdtemp()
+    >>> filename = os.path.join(tmp, 'm.py')
+    >>> manifest = os.path.join(tmp, 'manifest.json')
+    >>> with open(filename, 'w') as fw:
+    >>>     fw.write('x = 1')
+    >>> cli._compile(filename, manifest=manifest)
+    >>> records = cli._load_manifest(manifest)
+    >>> assert records[filename][3] == 'timestamp'
+    >>> st = os.stat(filename)
+    >>> assert cli._is_up_to_date(filename, st, records, 'timestamp')
+    >>> assert not cli._is_up_to_date(filename, st, records, 'checked-hash')
+    >>> assert not cli._is_up_to_date(filename, st, {filename: records[filename][:3]}, 'timestamp')
+    >>> # only the mtime changed, the header and the manifest entry are refreshed.
+    >>> os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    >>> touched = os.stat(filename)
+    >>> assert not cli._pyc_header_matches(filename, touched, 'timestamp')
+    >>> assert cli._is_up_to_date(filename, touched, records, 'timestamp')
+    >>> assert cli._pyc_header_matches(filename, touched, 'timestamp')
+    >>> assert records[filename][:2] == [touched.st_mtime_ns, touched.st_size]
+    >>> with open(filename, 'w') as fw:
+    >>>     fw.write('x = 22')
+    >>> assert not cli._is_up_to_date(filename, os.stat(filename), records, 'timestamp')
+    >>> # without a manifest entry, the header of the .pyc is checked.
+    >>> assert not cli._is_up_to_date(filename, os.stat(filename), {}, 'timestamp')
+    >>> def written():
+    >>>     with profiling.Profile() as profile:
+    >>>         cli._compile(filename, incremental=True)
+    >>>     return 'write_pyc' in profile.summary()
+    >>> assert written() and not written()
+    >>> assert cli._is_up_to_date(filename, os.stat(filename), {}, 'timestamp')
+    """
+    entry = manifest.get(os.path.abspath(filename))
+    if entry is None:
+        return _pyc_header_matches(filename, st, invalidation)
+
+    if len(entry) != 4 or entry[3] != invalidation:
+        # written by an older version or for another invalidation mode.
+        return False
+
+    mtime, size, hashed, _ = entry
+    pyc_path = _pyc_path(filename)
+    if not os.path.exists(pyc_path):
+        return False
+
+    if (mtime, size) == (st.st_mtime_ns, st.st_size):
+        return True
+
+    if size != st.st_size or hashed != _read_source_hash(filename):
+        return False
+
+    # only the timestamp changed, refresh the header and the manifest.
+    with open(pyc_path, 'rb') as fr:
+        data = fr.read()
+    header = _pack_pyc_header(filename, st, invalidation)
+    if data[:_pyc_header_size] != header:
+        write_atomic(pyc_path, header + data[_pyc_header_size:])
+    entry[:2] = st.st_mtime_ns, st.st_size
+    return True
+
+
+def _stages_grammar(stale, processes):
+    # staged before compiling, instead of after `stage_grammar_bytes` parsed.
+    return sum(st.st_size for _, st in stale) >= stage_grammar_bytes * processes
+
+
+def _collect_sources(paths, recursive):
+    for path in paths:
+        if not (recursive and os.path.isdir(path)):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(
+                each for each in dirs if each != '__pycache__' and not each.startswith('.'))
+            for each in sorted(files):
+                if each.endswith('.py'):
+                    yield os.path.join(root, each)
+
+
 @python_ex.alias('compile')
-def _compile(*filenames: str):
-    for filename in filenames:
-        code = compile_ex_python_from_filename(filename)
-        timestamp = struct.pack('i', int(time.time()))
-        marshalled_code_object = marshal.dumps(code)
-        filename, ext = os.path.splitext(filename)
-        filename = filename + '.pyc'
-        with Path(filename).open('wb') as f:
-            f.write(MAGIC_NUMBER)
-            f.write(timestamp)
-            f.write(b'A\x00\x00\x00')
-            f.write(marshalled_code_object)
+def _compile(*filenames: str,
+             jobs: int = 1,
+             recursive: bool = False,
+             incremental: bool = False,
+             manifest: str = None,
+             invalidation: str = 'timestamp',
+             profile: bool = False):
+    """
+    filenames   :  input filenames, compiled to `__pycache__` like `py_compile` does
+    jobs        :  number of worker processes, 0 to use all cores
+    recursive   :  compile every .py file under the directories in `filenames`
+    incremental :  skip files whose .pyc is up to date with the source
+    manifest    :  a json file recording source mtime, size, hash and invalidation mode of
+                   compiled files. implies `incremental`.
+    invalidation:  timestamp, checked-hash or unchecked-hash, see PEP 552.
+    profile     :  report the time, allocated memory blocks, AST nodes and instructions
+                   of each phase of compiling, implies `jobs=1`.
+    """
+    _check_invalidation(invalidation)
+
+    filenames = list(_collect_sources(filenames, recursive))
+    incremental = incremental or manifest is not None
+    records = _load_manifest(manifest) if manifest is not None else {}
+
+    stats = [os.stat(filename) for filename in filenames]
+    if incremental:
+        stale = [(filename, st) for filename, st in zip(filenames, stats)
+                 if not _is_up_to_date(filename, st, records, invalidation)]
+    else:
+        stale = list(zip(filenames, stats))
+
+    filenames = [filename for filename, _ in stale]
+    if profile:
+        # the phases run in worker processes are not recorded, compile in this one.
+        with profiling.Profile() as recorder:
+            if _stages_grammar(stale, 1):
+                fix_grammar()
+            results = map(_marshal_compiled, filenames)
+            _write_all(stale, results, records, manifest, invalidation)
+        print(recorder.report())
+        return
+
+    if jobs == 1 or len(filenames) < 2:
+        if _stages_grammar(stale, 1):
+            fix_grammar()
+        results = map(_marshal_compiled, filenames)
+        _write_all(stale, results, records, manifest, invalidation)
+        return
+
+    _compile_in_workers(stale, jobs, records, manifest, invalidation)
+
+
+def _compile_in_workers(stale, jobs, records, manifest, invalidation):
+    """
+    compile `stale` in a pool of at most `jobs` worker processes, all cores for 0.
+
+    title: parallel compile
+    prepare:
+    >>> import importlib, os, subprocess, sys, tempfile
+    >>> from yapypy.extended_python import pycompat
+    >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+    >>> from yapypy.cmd import cli
+    test:
+    >>> tmp = tempfile.mkdtemp()
+    >>> filenames = [os.path.join(tmp, f'yapypy_job{i}.py') for i in range(3)]
+    >>> for i, filename in enumerate(filenames):
+    >>>     with open(filename, 'w') as fw:
+    >>>         fw.write(f'value = (answer := {i})')
+    >>> command = 'from yapypy.cmd.cli import python_ex_cli; python_ex_cli()'
+    >>> root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(cli.__file__))))
+    >>> subprocess.run([sys.executable, '-c', command, 'compile', *filenames, '-jobs', '2'],
+    >>>                cwd=root, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    >>> sys.path.insert(0, tmp)
+    >>> try:
+    >>>     for i in range(3):
+    >>>         assert importlib.import_module(f'yapypy_job{i}').answer == i
+    >>> finally:
+    >>>     sys.path.remove(tmp)
+    """
+    filenames = [filename for filename, _ in stale]
+    options = {}
+    processes = min(jobs or os.cpu_count() or 1, len(filenames))
+    # `initializer` is new in Python 3.7.
+    if sys.version_info >= (3, 7) and _stages_grammar(stale, processes):
+        options['initializer'] = fix_grammar
+    with ProcessPoolExecutor(processes, **options) as executor:
+        results = executor.map(_marshal_compiled, filenames)
+        _write_all(stale, results, records, manifest, invalidation)
+
+
+def _write_all(stale, results, records, manifest, invalidation):
+    """
+    write the .pyc files of `stale` and record them in `manifest`, which is saved even
+    if a source fails to compile.
+
+    title: manifest of a failed compile
+    prepare:
+    >>> import os, sys, tempfile
+    >>> from yapypy.extended_python import pycompat
+    >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+    >>> from yapypy.cmd import cli
+    test:
+    >>> tmp = tempfile.mkdtemp()
+    >>> good, bad = os.path.join(tmp, 'good.py'), os.path.join(tmp, 'bad.py')
+    >>> manifest = os.path.join(tmp, 'manifest.json')
+    >>> for filename, source in [(good, 'x = 1'), (bad, 'x = (')]:
+    >>>     with open(filename, 'w') as fw:
+    >>>         fw.write(source)
+    >>> try:
+    >>>     cli._compile(good, bad, manifest=manifest)
+    >>> except Exception:
+    >>>     pass
+    >>> else:
+    >>>     assert False, 'bad.py compiled'
+    >>> records = cli._load_manifest(manifest)
+    >>> assert list(records) == [good] and records[good][2] == cli._read_source_hash(good)
+    """
+    try:
+        for (filename, st), (hashed, marshalled_code_object) in zip(stale, results):
+            with profiling.phase('write_pyc', filename):
+                _write_pyc(filename, st, marshalled_code_object, invalidation)
+            if manifest is not None:
+                records[os.path.abspath(filename)] = [
+                    st.st_mtime_ns, st.st_size, hashed, invalidation
+                ]
+    finally:
+        # keep the records of the files written before one failed.
+        if manifest is not None:
+            _save_manifest(manifest, records)
+
+
+def _watch_once(paths, snapshot: dict, invalidation):
+    """
+    compile the sources under `paths` which changed since the last scan recorded in
+    `snapshot`, and return their filenames.
+
+    title: watch
+    prepare:
+    >>> import os, sys, tempfile
+    >>> from yapypy.extended_python import pycompat
+    >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+    >>> from yapypy.cmd import cli
+    test:
+    >>> tmp = tempfile.mkdtemp()
+    >>> def write(name, source):
+    >>>     filename = os.path.join(tmp, name)
+    >>>     os.makedirs(os.path.dirname(filename), exist_ok=True)
+    >>>     with open(filename, 'w') as fw:
+    >>>         fw.write(source)
+    >>>     return filename
+    >>> a, b = write(os.path.join('sub', 'a.py'), 'x = 1'), write('b.py', 'y = 2')
+    >>> write(os.path.join('.hidden', 'c.py'), 'z = 3')
+    >>> snapshot = {}
+    >>> assert cli._watch_once([tmp], snapshot, 'timestamp') == [b, a]
+    >>> assert cli._watch_once([tmp], snapshot, 'timestamp') == []
+    >>> write(os.path.join('sub', 'a.py'), 'x = 11')
+    >>> d = write('d.py', 'w = 4')
+    >>> assert cli._watch_once([tmp], snapshot, 'timestamp') == [d, a]
+    >>> os.remove(b)
+    >>> assert cli._watch_once([tmp], snapshot, 'timestamp') == [] and b not in snapshot
+    >>> # the .pyc files written by an earlier run are up to date.
+    >>> assert cli._watch_once([tmp], {}, 'timestamp') == []
+    >>> write('b.py', 'y = 22')
+    >>> cli._compile(tmp, recursive=True)
+    >>> assert cli._watch_once([tmp], {}, 'timestamp') == []
+    >>> assert not os.path.exists(cli._pyc_path(os.path.join(tmp, '.hidden', 'c.py')))
+    """
+    compiled = []
+    seen = set()
+    for filename in _collect_sources(paths, recursive=True):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            continue
+
+        seen.add(filename)
+        key = st.st_mtime_ns, st.st_size
+        last = snapshot.get(filename)
+        if last == key:
+            continue
+
+        snapshot[filename] = key
+        if last is None and _pyc_header_matches(filename, st, invalidation):
+            continue
+
+        try:
+            _, marshalled_code_object = _marshal_compiled(filename)
+            _write_pyc(filename, st, marshalled_code_object, invalidation)
+        except Exception as exc:
+            # keep watching, the file is going to be fixed and saved again.
+            print(f'failed to compile {filename}: {exc!r}')
+            continue
+        compiled.append(filename)
+
+    for filename in set(snapshot) - seen:
+        del snapshot[filename]
+
+    return compiled
+
+
+@python_ex
+def watch(*paths: str, interval: float = 1.0, invalidation: str = 'timestamp'):
+    """
+    paths       :  source files or directories, watched recursively
+    interval    :  seconds between two scans of `paths`
+    invalidation:  timestamp, checked-hash or unchecked-hash, see PEP 552.
+    """
+    _check_invalidation(invalidation)
+
+    # the daemon lives long enough for staging the parsers to pay off.
+    fix_grammar()
+    snapshot = {}
+    while True:
+        for filename in _watch_once(paths, snapshot, invalidation):
+            print(f'compiled {filename}')
+        time.sleep(interval)
 
 
 def python_ex_cli():
@@ -0,0 +1,169 @@
+"""
+on-disk cache of code objects emitted by yapypy, laid out like `__pycache__`.
+
+A cache file is named `<module>.<cache_tag>.opt-yapypy.pyc` and starts with a header
+which holds everything required to validate it without compiling anything:
+
+    MAGIC_NUMBER  (4 bytes) the magic of the running CPython
+    fingerprint   (8 bytes) hash of yapypy's version and the RBNF grammar
+    mtime         (4 bytes) source mtime
+    size          (4 bytes) source size
+    source hash   (8 bytes) hash of the source bytes
+
+followed by the marshalled code object.
+"""
+import hashlib
+import marshal
+import os
+import struct
+import sys
+import types
+from importlib.util import MAGIC_NUMBER, cache_from_source
+from typing import Optional
+
+from yapypy import __version__
+from yapypy.extended_python.grammar import RBNF
+
+OPTIMIZATION_TAG = 'yapypy'
+
+_header = struct.Struct('<4s8sII8s')
+
+
+def _make_fingerprint():
+    hasher = hashlib.sha1()
+    hasher.update(__version__.encode())
+    hasher.update(RBNF.encode())
+    return hasher.digest()[:8]
+
+
+FINGERPRINT = _make_fingerprint()
+
+
+def source_hash(source_bytes: bytes) -> bytes:
+    return hashlib.blake2b(source_bytes, digest_size=8).digest()
+
+
+def cache_path(source_path: str) -> str:
+    return cache_from_source(source_path, optimization=OPTIMIZATION_TAG)
+
+
+def _pack_stat(st: os.stat_result):
+    return int(st.st_mtime) & 0xFFFFFFFF, st.st_size & 0xFFFFFFFF
+
+
+def load_cached_code(source_path: str,
+                     st: os.stat_result,
+                     source_bytes: bytes = None) -> Optional[types.CodeType]:
+    """
+    return the cached code object of `source_path` if it is still valid, otherwise None.
+
+    A cache entry is valid when it is written by the same CPython, yapypy and grammar, and
+    either the source mtime and size are unchanged, or `source_bytes` is given and
+    hashes the same as the cached source.
+
+    title: bytecode cache
+    prepare:
+    >>> import os, sys, tempfile
+    >>> from yapypy.extended_python.bytecode_cache import cache_path, load_cached_code, store_code
+    test:
+    >>> dont_write_bytecode = sys.dont_write_bytecode
+    >>> sys.dont_write_bytecode = False
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'm.py')
+    >>> try:
+    >>>     with open(filename, 'wb') as fw:
+    >>>         fw.write(b'x = 1')
+    >>>     st = os.stat(filename)
+    >>>     assert load_cached_code(filename, st) is None
+    >>>     store_code(filename, st, b'x = 1', compile('x = 1', filename, 'exec'))
+    >>>     assert cache_path(filename).endswith('.opt-yapypy.pyc')
+    >>>     namespace = {}
+    >>>     exec(load_cached_code(filename, st), namespace)
+    >>>     assert namespace['x'] == 1
+    >>>     # only the timestamp changed, valid with the source hash only.
+    >>>     os.utime(filename, (st.st_atime, st.st_mtime + 10))
+    >>>     touched = os.stat(filename)
+    >>>     assert load_cached_code(filename, touched) is None
+    >>>     assert load_cached_code(filename, touched, b'x = 1') is not None
+    >>>     with open(filename, 'wb') as fw:
+    >>>         fw.write(b'x = 22')
+    >>>     changed = os.stat(filename)
+    >>>     assert load_cached_code(filename, changed, b'x = 22') is None
+    >>>     # written by another yapypy or grammar.
+    >>>     with open(cache_path(filename), 'r+b') as fw:
+    >>>         fw.seek(4)
+    >>>         fw.write(bytes(8))
+    >>>     assert load_cached_code(filename, st) is None
+    >>>     os.remove(cache_path(filename))
+    >>>     # the opt-out of PYTHONDONTWRITEBYTECODE.
+    >>>     sys.dont_write_bytecode = True
+    >>>     store_code(filename, changed, b'x = 22', compile('x = 22', filename, 'exec'))
+    >>>     assert not os.path.exists(cache_path(filename))
+    >>> finally:
+    >>>     sys.dont_write_bytecode = dont_write_bytecode
+    """
+    try:
+        with open(cache_path(source_path), 'rb') as fr:
+            data = fr.read()
+    except (OSError, NotImplementedError):
+        return None
+
+    if len(data) < _header.size:
+        return None
+
+    magic, fingerprint, mtime, size, hashed = _header.unpack_from(data)
+    if magic != MAGIC_NUMBER or fingerprint != FINGERPRINT:
+        return None
+
+    if (mtime, size) != _pack_stat(st):
+        if source_bytes is None or hashed != source_hash(source_bytes):
+            return None
+
+    try:
+        code = marshal.loads(data[_header.size:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    return code if isinstance(code, types.CodeType) else None
+
+
+def store_code(source_path: str, st: os.stat_result, source_bytes: bytes,
+               code: types.CodeType):
+    """
+    write the cache entry of `source_path`. Failures are ignored, as the cache is
+    only an optimization.
+    """
+    if sys.dont_write_bytecode:
+        return
+
+    try:
+        path = cache_path(source_path)
+    except NotImplementedError:
+        return
+
+    mtime, size = _pack_stat(st)
+    data = _header.pack(MAGIC_NUMBER, FINGERPRINT, mtime, size, source_hash(source_bytes))
+    data += marshal.dumps(code)
+
+    try:
+        write_atomic(path, data)
+    except OSError:
+        pass
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    write `data` to a temporary file then move it to `path`, so that readers never see
+    a partially written file.
+    """
+    tmp_path = '{}.{}'.format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path) or os.curdir, exist_ok=True)
+        with open(tmp_path, 'wb') as fw:
+            fw.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
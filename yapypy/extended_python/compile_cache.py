@@ -0,0 +1,111 @@
+"""
+in-process LRU cache of compiled sources, for hosts compiling the same sources again
+and again.
+
+`code_cache` holds the code objects compiled by `cli.compile_ex_python_from_source` and
+`cli.compile_ex_python_from_filename`. Entries are keyed by the hash of the source and
+the filename, so an edited source never hits a stale entry.
+"""
+import typing as t
+from collections import OrderedDict
+
+from yapypy.extended_python.bytecode_cache import source_hash
+
+CacheInfo = t.NamedTuple('CacheInfo', [('hits', int), ('misses', int), ('evictions', int),
+                                       ('size', int), ('maxsize', t.Optional[int])])
+
+
+class LRUCache:
+    """
+    a least recently used cache of at most `maxsize` entries, `None` for no limit and
+    0 to disable it. `on_evict(key, value)` is called with each evicted entry.
+    """
+    __slots__ = ('maxsize', 'on_evict', 'hits', 'misses', 'evictions', '_entries')
+
+    def __init__(self, maxsize: t.Optional[int] = 128,
+                 on_evict: t.Optional[t.Callable[[t.Hashable, object], None]] = None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        entries = self._entries
+        try:
+            value = entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        add an entry, evicting the least recently used ones beyond `maxsize`.
+
+        title: lru cache
+        test:
+        >>> from yapypy.extended_python.compile_cache import LRUCache
+        >>> evicted = []
+        >>> cache = LRUCache(2, on_evict=lambda key, value: evicted.append(key))
+        >>> cache.put('a', 1)
+        >>> cache.put('b', 2)
+        >>> assert cache.get('a') == 1
+        >>> cache.put('c', 3)
+        >>> assert evicted == ['b'] and cache.get('b') is None
+        >>> assert tuple(cache.info()) == (1, 1, 1, 2, 2)
+        >>> cache.resize(1)
+        >>> assert evicted == ['b', 'a'] and 'c' in cache
+        >>> cache.resize(0)
+        >>> cache.put('d', 4)
+        >>> assert len(cache) == 0 and cache.get('d') is None
+        """
+        if self.maxsize == 0:
+            return
+        entries = self._entries
+        entries[key] = value
+        entries.move_to_end(key)
+        self._shrink()
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        drop all entries and reset the counters.
+        """
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def resize(self, maxsize: t.Optional[int]):
+        self.maxsize = maxsize
+        self._shrink()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, len(self._entries),
+                         self.maxsize)
+
+    def _shrink(self):
+        maxsize = self.maxsize
+        if maxsize is None:
+            return
+        entries = self._entries
+        while len(entries) > maxsize:
+            key, value = entries.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict:
+                self.on_evict(key, value)
+
+
+code_cache = LRUCache(256)
+
+
+def source_key(source: str, filename: str, *extra) -> tuple:
+    return (source_hash(source.encode('utf-8', 'surrogatepass')), filename, *extra)
@@ -312,7 +312,7 @@ def py_emit(node: ast.Subscript, ctx: Context):
     >>> x.append(1)
     >>> x += [2, 3, 4]
     >>> del x[:2]
-    >>> assert len(x) = 2
+    >>> assert len(x) == 2
     >>> class S:
     >>>     def __getitem__(self, i):
     >>>        if i == (slice(1, 2, None), slice(2, 3, -1)):
@@ -339,17 +339,21 @@ def py_emit(node: ast.Subscript, ctx: Context):
     ctx.bc.append(command(lineno=node.lineno))
 
 
+_name_commands = {
+    ast.Load: Context.load_name,
+    ast.Store: Context.store_name,
+    ast.Del: Context.del_name,
+}
+
+
 @py_emit.case(ast.Name)
 def py_emit(node: ast.Name, ctx: Context):
-    command = {
-        ast.Load: ctx.load_name,
-        ast.Store: ctx.store_name,
-        ast.Del: ctx.del_name,
-    }.get(type(node.ctx))
+    command = _name_commands.get(type(node.ctx))
 
     assert command is not None
 
     command(
+        ctx,
         node.id,
         lineno=node.lineno,
     )
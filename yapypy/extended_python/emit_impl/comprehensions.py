@@ -212,7 +212,7 @@ def py_emit(node: ast.DictComp, ctx: Context):
     >>> async def f():
     >>>     return {i: i % 5 async for i in S() if i > 3}
     >>> it = get_event_loop().run_until_complete(f())
-    >>> assert it = {4: 4, 5: 0, 6: 1, 7: 2, 8: 3, 9: 4, 10: 0}
+    >>> assert it == {4: 4, 5: 0, 6: 1, 7: 2, 8: 3, 9: 4, 10: 0}
     """
 
     ctx.bc.argnames.append('.0')
@@ -234,7 +234,7 @@ def py_emit(node: ast.DictComp, ctx: Context):
         flags = 0x08
         ctx.load_closure()
 
-    inner_code = ctx.bc.to_code()
+    inner_code = ctx.to_code()
     parent.bc.append(LOAD_CONST(inner_code))
     parent.bc.append(LOAD_CONST(f'{ctx.bc.name}.<locals>.<dictcomp>'))
     parent.bc.append(MAKE_FUNCTION(flags))
@@ -311,7 +311,7 @@ def py_emit(node: ast.SetComp, ctx: Context):
         flags = 0x08
         ctx.load_closure()
 
-    inner_code = ctx.bc.to_code()
+    inner_code = ctx.to_code()
     parent.bc.append(LOAD_CONST(inner_code))
     parent.bc.append(LOAD_CONST(f'{ctx.bc.name}.<locals>.<setcomp>'))
     parent.bc.append(MAKE_FUNCTION(flags))
@@ -386,7 +386,7 @@ def py_emit(node: ast.ListComp, ctx: Context):
         flags = 0x08
         ctx.load_closure()
 
-    inner_code = ctx.bc.to_code()
+    inner_code = ctx.to_code()
     parent.bc.append(LOAD_CONST(inner_code))
     parent.bc.append(LOAD_CONST(f'{ctx.bc.name}.<locals>.<listcomp>'))
     parent.bc.append(MAKE_FUNCTION(flags))
@@ -483,7 +483,7 @@ prepare:
     else:
         ctx.bc.flags |= CompilerFlags.GENERATOR
 
-    inner_code = ctx.bc.to_code()
+    inner_code = ctx.to_code()
     parent.bc.append(LOAD_CONST(inner_code))
     parent.bc.append(LOAD_CONST(f'{ctx.bc.name}.<locals>.<genexp>'))
     parent.bc.append(MAKE_FUNCTION(flags))
@@ -7,7 +7,7 @@ def py_emit(node: ast.YieldFrom, ctx: Context):
     title: yield from
     test:
     >>> def f():
-    >>>   yield from 1,
+    >>>   yield from (1,)
     >>> assert next(f()) == 1
     """
 
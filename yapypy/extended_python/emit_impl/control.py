@@ -64,7 +64,7 @@ def py_emit(node: ast.If, ctx: Context):
     >>>     c = 3
     >>>     d = 4
     >>>     x = d
-    >>> assert a, b, c, d, x == 1, 2, 3, 4, d
+    >>> assert (a, b, c, d, x) == (1, 2, 3, 4, d)
     """
 
     is_const = False
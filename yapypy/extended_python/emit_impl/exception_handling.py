@@ -56,7 +56,7 @@ def py_emit(node: ast.Assert, ctx: Context):
     >>>     assert isinstance(e, AssertionError)
 
     test:
-    >>> def assert_zero ()
+    >>> def assert_zero():
     >>>     assert 0,"num is zero"
     >>> cache_exc(assert_zero, handler_zero)
     """
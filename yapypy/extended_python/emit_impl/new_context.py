@@ -107,7 +107,7 @@ def emit_function(node: typing.Union[ast.AsyncFunctionDef, ast.FunctionDef, ast.
     new_ctx.bc.append(Instr('LOAD_CONST', None))
     new_ctx.bc.append(Instr('RETURN_VALUE'))
 
-    inner_code = new_ctx.bc.to_code()
+    inner_code = new_ctx.to_code()
     parent_ctx.bc.append(Instr('LOAD_CONST', inner_code, lineno=node.lineno))
 
     # when it comes to nested, the name is not generated correctly now.
@@ -194,7 +194,7 @@ def py_emit(node: ast.ClassDef, ctx: Context):
     >>> @call
     >>> class S:
     >>>     def p(self): return 42
-    >>> assert S.p == 42
+    >>> assert S.p() == 42
     """
     lineno = node.lineno
     col_offset = node.col_offset
@@ -251,7 +251,7 @@ def py_emit(node: ast.ClassDef, ctx: Context):
         RETURN_VALUE()
     ])
 
-    inner_code = ctx.bc.to_code()
+    inner_code = ctx.to_code()
     # return from new block.
 
     # 3. load a function (or closure) made from the code object
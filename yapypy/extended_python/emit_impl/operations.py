@@ -1,58 +1,100 @@
 from yapypy.extended_python.pybc_emit import *
 
+_unary_instrs = {
+    ast.Not: "UNARY_NOT",
+    ast.USub: "UNARY_NEGATIVE",
+    ast.UAdd: "UNARY_POSITIVE",
+    ast.Invert: "UNARY_INVERT"
+}
+
+_binary_instrs = {
+    ast.Add: "BINARY_ADD",
+    ast.BitAnd: "BINARY_AND",
+    ast.Sub: "BINARY_SUBTRACT",
+    ast.Div: "BINARY_TRUE_DIVIDE",
+    ast.FloorDiv: "BINARY_FLOOR_DIVIDE",
+    ast.LShift: "BINARY_LSHIFT",
+    ast.RShift: "BINARY_RSHIFT",
+    ast.MatMult: "BINARY_MATRIX_MULTIPLY",
+    ast.Pow: "BINARY_POWER",
+    ast.BitOr: "BINARY_OR",
+    ast.BitXor: "BINARY_XOR",
+    ast.Mult: "BINARY_MULTIPLY",
+    ast.Mod: "BINARY_MODULO",
+}
+
+_bool_op_instrs = {
+    ast.And: "JUMP_IF_FALSE_OR_POP",
+    ast.Or: "JUMP_IF_TRUE_OR_POP",
+}
+
+
+def _emit_operations(node: ast.expr, ctx: Context):
+    """
+    emit a tree of unary, binary and boolean operations from a stack of the nodes and
+    the instructions left to emit, `py_emit` is only called for the other operands.
+    Long expressions, like the sums of thousands of terms, thus neither hit the
+    recursion limit nor pay a call per operation.
+
+    title: long expressions
+    test:
+    >>> import ast
+    >>> from yapypy.extended_python.py_compile import py_compile
+    >>> n = 5000
+    >>> src = (f'total = ' + ' + '.join(['one'] * n) + '\\n'
+    >>>        f'text = ' + ' + '.join(["'ab'"] * n) + '\\n'
+    >>>        f'first = ' + ' or '.join(['zero'] * n + ['one']) + '\\n'
+    >>>        f'mixed = ' + ' - '.join(['-one * 2 and ~zero | one'] * n) + '\\n')
+    >>> namespace = {'one': 1, 'zero': 0}
+    >>> exec(py_compile(ast.parse(src), 'long.py'), namespace)
+    >>> assert (namespace['total'], namespace['text'], namespace['first']) == (n, 'ab' * n, 1)
+    >>> assert namespace['mixed'] == eval(src.splitlines()[-1][len('mixed = '):], namespace)
+    """
+    bc = ctx.bc
+    stack = [node]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        each = pop()
+        if isinstance(each, ast.BinOp):
+            inst = _binary_instrs.get(type(each.op))
+            assert inst is not None
+            push(Instr(inst, lineno=each.lineno))
+            push(each.right)
+            push(each.left)
+        elif isinstance(each, ast.UnaryOp):
+            inst = _unary_instrs.get(type(each.op))
+            if not inst:
+                raise TypeError
+            push(Instr(inst, lineno=each.lineno))
+            push(each.operand)
+        elif isinstance(each, ast.BoolOp):
+            inst = _bool_op_instrs.get(type(each.op))
+            if inst is None:
+                raise TypeError
+            label = Label()
+            values = each.values
+            push(label)
+            push(values[-1])
+            for expr in reversed(values[:-1]):
+                push(Instr(inst, label, lineno=each.lineno))
+                push(expr)
+        elif isinstance(each, ast.AST):
+            py_emit(each, ctx)
+        else:
+            bc.append(each)
+
 
 @py_emit.case(ast.UnaryOp)
 def py_emit(node: ast.UnaryOp, ctx: Context):
-    py_emit(node.operand, ctx)
-    inst = {
-        ast.Not: "UNARY_NOT",
-        ast.USub: "UNARY_NEGATIVE",
-        ast.UAdd: "UNARY_POSITIVE",
-        ast.Invert: "UNARY_INVERT"
-    }.get(type(node.op))
-    if inst:
-        ctx.bc.append(Instr(inst, lineno=node.lineno))
-    else:
-        raise TypeError
+    _emit_operations(node, ctx)
 
 
 @py_emit.case(ast.BinOp)
 def py_emit(node: ast.BinOp, ctx: Context):
-    py_emit(node.left, ctx)
-    py_emit(node.right, ctx)
-    inst = {
-        ast.Add: "BINARY_ADD",
-        ast.BitAnd: "BINARY_AND",
-        ast.Sub: "BINARY_SUBTRACT",
-        ast.Div: "BINARY_TRUE_DIVIDE",
-        ast.FloorDiv: "BINARY_FLOOR_DIVIDE",
-        ast.LShift: "BINARY_LSHIFT",
-        ast.RShift: "BINARY_RSHIFT",
-        ast.MatMult: "BINARY_MATRIX_MULTIPLY",
-        ast.Pow: "BINARY_POWER",
-        ast.BitOr: "BINARY_OR",
-        ast.BitXor: "BINARY_XOR",
-        ast.Mult: "BINARY_MULTIPLY",
-        ast.Mod: "BINARY_MODULO",
-    }.get(type(node.op))
-
-    assert inst is not None
-    ctx.bc.append(Instr(inst, lineno=node.lineno))
+    _emit_operations(node, ctx)
 
 
 @py_emit.case(ast.BoolOp)
 def py_emit(node: ast.BoolOp, ctx: Context):
-    inst = {
-        ast.And: "JUMP_IF_FALSE_OR_POP",
-        ast.Or: "JUMP_IF_TRUE_OR_POP",
-    }.get(type(node.op))
-
-    if inst is not None:
-        label = Label()
-        for expr in node.values[:-1]:
-            py_emit(expr, ctx)
-            ctx.bc.append(Instr(inst, label, lineno=node.lineno))
-        py_emit(node.values[-1], ctx)
-        ctx.bc.append(label)
-    else:
-        raise TypeError
+    _emit_operations(node, ctx)
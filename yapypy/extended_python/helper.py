@@ -1,5 +1,6 @@
 from rbnf.core.Tokenizer import Tokenizer
 import yapypy.extended_python.extended_ast as ex_ast
+from yapypy.extended_python.literals import decode_number, decode_string, named_constants
 import ast
 import typing as t
 
@@ -69,7 +70,10 @@ def as_del(it):
 
 
 def _parse_expr(token: Tokenizer):
-    expr = ast.parse(token.value).body[0].value
+    expr = decode_string(token.value)
+    if expr is None:
+        # f-strings with replacement fields, invalid escapes, or a malformed literal.
+        expr = ast.parse(token.value).body[0].value
     expr.lineno = token.lineno
     expr.col_offset = token.colno
     return expr
@@ -322,7 +326,7 @@ def atom_rewrite(loc, name, token, value, number, strs, namedc, ellipsis, dict,
             ast.Name(name.value, ast.Store(), **loc @ name), value=value, **loc @ token)
 
     if number:
-        return ast.Num(eval(number.value), **loc @ number)
+        return ast.Num(decode_number(number.value), **loc @ number)
 
     if strs:
         return str_maker(*strs)
@@ -331,7 +335,7 @@ def atom_rewrite(loc, name, token, value, number, strs, namedc, ellipsis, dict,
         return ast.Ellipsis()
 
     if namedc:
-        return ast.NameConstant(eval(namedc.value), **loc @ namedc)
+        return ast.NameConstant(named_constants[namedc.value], **loc @ namedc)
 
     if is_dict:
         return dict or ex_ast.ExDict([], [], ast.Load(), **loc @ is_dict)
@@ -0,0 +1,127 @@
+"""
+decoders of the literal tokens, building their AST nodes without compiling anything.
+
+`ast.parse` and `eval` are only called for the literals these decoders do not handle:
+f-strings with replacement fields, and the malformed ones, for the `SyntaxError` CPython
+reports.
+"""
+import ast
+import codecs
+import re
+import typing as t
+
+named_constants = {'True': True, 'False': False, 'None': None}
+
+_string_prefix_chars = frozenset('rRbBuUfF')
+
+_escape = re.compile(r'\\(.)', re.DOTALL)
+_bytes_escape_chars = frozenset('\n\\\'"abfnrtv01234567x')
+_str_escape_chars = _bytes_escape_chars | frozenset('NuU')
+
+
+def _has_invalid_escape(body: str, escape_chars: frozenset) -> bool:
+    # CPython warns about them, at the line of the literal from `ast.parse`.
+    return any(each not in escape_chars for each in _escape.findall(body))
+
+
+def decode_number(text: str) -> t.Union[int, float, complex]:
+    """
+    title: number literals
+    test:
+    >>> from yapypy.extended_python.literals import decode_number
+    >>> for each in ['0', '00', '42', '1_000', '0x_fF', '0o17', '0B1_0', '3.14', '1.', '.5', '1e-3', '1_0.0_1E+1_0', '2j', '1.5J', '1_0j', '0e0']:
+    >>>     value = decode_number(each)
+    >>>     assert value == eval(each) and type(value) is type(eval(each)), each
+    """
+    if text[-1] in 'jJ':
+        try:
+            return complex(0, float(text[:-1]))
+        except ValueError:
+            return eval(text)
+    try:
+        return int(text, 0)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        # malformed, let CPython raise the error.
+        return eval(text)
+
+
+def decode_string(text: str) -> t.Optional[ast.expr]:
+    """
+    decode a STRING token to `ast.Str`, `ast.Bytes` or `ast.JoinedStr`, or return None
+    for the f-strings with replacement fields and the literals which are not valid.
+
+    The nodes have no location, so the `ast.Str` of an f-string without fields takes the
+    line of the f-string, where `ast.parse` used to put it on line 1.
+
+    title: string literals
+    test:
+    >>> import ast, dis, warnings
+    >>> from yapypy.extended_python.literals import decode_string
+    >>> from yapypy.extended_python.parser import parse
+    >>> from yapypy.extended_python.py_compile import py_compile
+    >>> sources = [r"'a'", r'"b"', r"''", "'''x\\ny'''", r"r'\\d\\n'", r"b'\\x00\\n\\''",
+    >>>            r"rb'\\x'", r"u'\\u4e2d\\N{BULLET}\\101'", "'\\\\\\n'", "'中文'", r"b''",
+    >>>            r"f'no fields {{}}'", r"F''", r"Rb'\\\\'", r"'\\\\d'"]
+    >>> with warnings.catch_warnings(record=True) as caught:
+    >>>     warnings.simplefilter('always')
+    >>>     for each in sources:
+    >>>         assert ast.dump(decode_string(each)) == ast.dump(ast.parse(each).body[0].value), each
+    >>> assert not caught, caught
+    >>> assert decode_string(r"f'{x}'") is None and decode_string(r"'\\中'") is None
+    >>> # invalid escapes are left to `ast.parse`, which warns at the line of the literal.
+    >>> for each in [r"'\\d'", r"'\\8'", r"b'\\d'", r"b'\\u0041'", r"b'\\N{BULLET}'"]:
+    >>>     assert decode_string(each) is None, each
+    >>> src = "x = 1\\n\\ny = f'ab'"
+    >>> assert parse(src).result.body[1].value.values[0].values[0].lineno == 3
+    >>> # line 3 starts at the LOAD_CONST of 'ab'.
+    >>> assert list(dis.findlinestarts(py_compile(parse(src).result))) == [(0, 1), (4, 3)]
+    """
+    i = 0
+    while text[i] in _string_prefix_chars:
+        i += 1
+    prefix = text[:i].lower()
+    quote = 3 if text.startswith(text[i] * 3, i) else 1
+    body = text[i + quote:len(text) - quote]
+
+    if 'f' in prefix:
+        literal = body.replace('{{', '').replace('}}', '')
+        if '{' in literal or '}' in literal or '\\' in body:
+            return None
+        value = body.replace('{{', '{').replace('}}', '}')
+        return ast.JoinedStr(values=[ast.Str(value)] if value else [])
+
+    if 'b' in prefix:
+        try:
+            raw = body.encode('ascii')
+        except UnicodeEncodeError:
+            return None
+        if 'r' not in prefix and '\\' in body:
+            if _has_invalid_escape(body, _bytes_escape_chars):
+                return None
+            try:
+                raw = codecs.escape_decode(raw)[0]
+            except ValueError:
+                return None
+        return ast.Bytes(raw)
+
+    return _decode_plain_str(prefix, body)
+
+
+def _decode_plain_str(prefix: str, body: str) -> t.Optional[ast.Str]:
+    if 'r' in prefix or '\\' not in body:
+        return ast.Str(body)
+    if _has_invalid_escape(body, _str_escape_chars):
+        return None
+    try:
+        # `unicode_escape` decodes bytes as latin-1.
+        raw = body.encode('latin-1')
+    except UnicodeEncodeError:
+        return None
+    try:
+        return ast.Str(raw.decode('unicode_escape'))
+    except UnicodeDecodeError:
+        return None
@@ -0,0 +1,101 @@
+"""
+packrat memoization for the rules of the rbnf grammar.
+
+A memoized rule remembers the result of its body at each token index in a table carried
+by `MemoState`, so the alternatives backtracking to the same tokens do not parse them
+again, e.g. the set alternative of `dictorsetmaker` re-parsing the `test` the dict one
+failed after, which made nested set literals exponential.
+
+Only the body of a rule is memoized, `when`, `with` and the rewrite of the rule still
+run on each use, so every use gets its own AST node of the rule.
+"""
+import typing as t
+
+from rbnf.core.Result import Matched, Unmatched
+from rbnf.core.State import State
+
+# the rules re-parsed by the backtracking alternatives of `atom`, `argument`,
+# `dictorsetmaker`, `testlist_comp` and `expr_stmt`.
+hot_rules = ('test', 'testlist_star_expr', 'star_expr')
+
+
+class MemoState(State):
+    """
+    a `State` memoizing the rules wrapped by `memoize`, a plain `State` does not.
+
+    The memo table keeps at most `memo_size` entries, the oldest ones are dropped first.
+    """
+
+    def __init__(self, lang, filename=None, memo_size: int = 4096):
+        super().__init__(lang, filename)
+        self.memo = {}
+        self.memo_size = memo_size
+
+
+class Memoized:
+    """
+    the body of a rule, memoized by (rule name, token index) in a `MemoState`.
+    """
+    __slots__ = ('name', 'parser')
+
+    def __init__(self, name: str, parser):
+        self.name = name
+        self.parser = parser
+
+    def as_fixed(self, lang):
+        self.parser.as_fixed(lang)
+
+    def match(self, tokenizers, state):
+        memo = getattr(state, 'memo', None)
+        if memo is None:
+            return self.parser.match(tokenizers, state)
+
+        start = state.end_index
+        key = (self.name, start)
+        entry = memo.get(key)
+        if entry is not None:
+            result, width, entered, ctx = entry
+            if result.status is Matched:
+                new_one = state.new_one
+                for _ in range(width):
+                    new_one()
+                append = state.append
+                for each in entered:
+                    append(each)
+                state.ctx = ctx
+            # tokens fetched by the first match are still recorded in `state.trace`,
+            # `state.max_fetched` for error reports is as it was.
+            return result
+
+        n_entered = len(state.current)
+        result = self.parser.match(tokenizers, state)
+        status = result.status
+        if status is Matched:
+            width = state.end_index - start
+            # the rules entered at the end index, to re-enter them for left recursion
+            # checking as the first match did.
+            entered = tuple(state.current)
+            if not width:
+                entered = entered[n_entered:]
+            entry = result, width, entered, state.ctx
+        elif status is Unmatched:
+            entry = result, 0, (), None
+        else:
+            # left recursion is resolved by the callers, depending on the rules entered.
+            return result
+
+        if len(memo) >= state.memo_size:
+            del memo[next(iter(memo))]
+        memo[key] = entry
+        return result
+
+
+def memoize(lang: dict, names: t.Iterable[str] = hot_rules):
+    """
+    wrap the bodies of the rules `names` in `lang`(`Language.implementation`)
+    with `Memoized`. It is idempotent.
+    """
+    for name in names:
+        parser, when, with_, rewrite = lang[name]
+        if not isinstance(parser, Memoized):
+            lang[name] = Memoized(name, parser), when, with_, rewrite
@@ -1,14 +1,25 @@
 from rbnf.core.Tokenizer import Tokenizer
 from rbnf.core.CachingPool import ConstStrPool
 from rbnf.core.State import State
-from rbnf.easy import Language, build_parser, build_language, ze
+from rbnf.edsl import Language
+import rbnf.zero as ze
 from keyword import kwlist
+from rbnf.__release_info__ import __VERSION__ as rbnf_version
+from yapypy import __version__ as yapypy_version
+from yapypy.extended_python.bytecode_cache import write_atomic
 from yapypy.extended_python.grammar import RBNF
+from yapypy.extended_python.memo import MemoState, memoize
+from yapypy.extended_python.token_store import TokenStore
 from yapypy.extended_python import helper, extended_ast
 import sys
 import ast
 import typing as t
 import io
+import re
+import os
+import hashlib
+import importlib.util
+from array import array
 
 if sys.version_info > (3, 8):  # avoid breakage at dev
     import tokenize
@@ -17,18 +28,52 @@ elif sys.version_info >= (3, 7):
 elif sys.version_info >= (3, 6):
     import yapypy.utils.yapypy_tokenize36 as tokenize
 
+if hasattr(tokenize, 'generate_tokens_from_source'):
+    generate_tokens_from_source = tokenize.generate_tokens_from_source
+else:
+    def generate_tokens_from_source(source: str):
+        return tokenize.generate_tokens(io.StringIO(source).readline)
+
+
 cast = ConstStrPool.cast_to_const
 kwlist = {*kwlist, 'async', 'await'}
 
 
+_token_names = {typ: cast(name) for typ, name in tokenize.tok_name.items()}
+
+_plain_token_types = {tokenize.NAME, tokenize.STRING, tokenize.NUMBER}
+
+
+def _make_interning_table():
+    """
+    (token type, string) -> (name, value) of the rbnf token, for every keyword, operator
+    and the tokens whose strings are fixed.
+    """
+    table = {(tokenize.NAME, each): (cast('KEYWORD'), cast(each)) for each in kwlist}
+    table.update(((tokenize.OP, each), (_token_names[tokenize.OP], cast(each)))
+                 for each in tokenize.EXACT_TOKEN_TYPES)
+    for typ, string in ((tokenize.NEWLINE, '\n'), (tokenize.NEWLINE, '\r\n'),
+                        (tokenize.NEWLINE, ''), (tokenize.DEDENT, ''), (tokenize.ENDMARKER, '')):
+        table[typ, string] = _token_names[typ], cast(string)
+    return table
+
+
+_interning_table = _make_interning_table()
+
+
+# `Tokenizer` is a namedtuple, skip its `__new__` written in python.
+_new_token = tuple.__new__
+
+
 def to_rbnf_token(tk: tokenize.TokenInfo) -> Tokenizer:
-    name = cast(tokenize.tok_name[tk.type])
-    if name == 'NAME' and tk.string in kwlist:
-        value = cast(tk.string)
-        name = cast('KEYWORD')
-    else:
-        value = cast(tk.string) if name not in ('NAME', 'STRING', 'NUMBER') else tk.string
-    return Tokenizer(name, value, *tk.start)
+    interned = _interning_table.get(tk[:2])
+    if interned is not None:
+        return _new_token(Tokenizer, (*interned, *tk.start))
+
+    typ, value = tk[:2]
+    if typ not in _plain_token_types:
+        value = cast(value)
+    return _new_token(Tokenizer, (_token_names[typ], value, *tk.start))
 
 
 tokens_to_ignore = (tokenize.COMMENT, tokenize.ENCODING, tokenize.NL)
@@ -38,18 +83,200 @@ def not_to_ignore(tk: tokenize.TokenInfo) -> bool:
     return tk.type not in tokens_to_ignore
 
 
-def lex(text: t.Union[str, bytes]):
+def _tokenize(text: t.Union[str, bytes]) -> t.Iterator[tokenize.TokenInfo]:
     if isinstance(text, str):
-        text = text.encode()
-    stream = io.BytesIO(text)
-    return map(to_rbnf_token, filter(not_to_ignore, tokenize.tokenize(stream.__next__)))
+        # no need to encode the whole source to bytes and detect the encoding again.
+        return generate_tokens_from_source(text)
+    return tokenize.tokenize(io.BytesIO(text).readline)
+
+
+def lex(text: t.Union[str, bytes]):
+    return map(to_rbnf_token, filter(not_to_ignore, _tokenize(text)))
+
+
+_line_end = re.compile('\n')
+
+# keywords continuing a top-level compound statement after its block is closed.
+_continuation_keywords = {'else', 'elif', 'except', 'finally'}
+
+
+def lex_store(text: t.Union[str, bytes]) -> t.Tuple[TokenStore, array]:
+    """
+    lex `text` into a `TokenStore`, and return it with the boundaries of the top-level
+    statements: the tokens of the i-th statement are in [boundaries[i], boundaries[i+1]).
+    Decorators are kept with the definition they decorate, and the ENDMARKER comes
+    as the last statement.
+
+    title: token store
+    test:
+    >>> from yapypy.extended_python.parser import lex, lex_store
+    >>> src = '@d\\nclass S: pass\\nif x:\\n  y = 1\\nelse:\\n  y = 2\\nz = "s"\\n'
+    >>> store, boundaries = lex_store(src)
+    >>> assert store.take(0, len(store)) == tuple(lex(src))
+    >>> assert [store[i].value for i in boundaries[:-1]] == ['@', 'if', 'z', '']
+    >>> assert list(store[-3:]) == list(tuple(lex(src))[-3:])
+    """
+    if isinstance(text, bytes):
+        text = importlib.util.decode_source(text)
+
+    # offsets of the lines in `text`, line numbers start from 1.
+    line_offsets = array('I', [0, 0])
+    line_offsets.extend(each.end() for each in _line_end.finditer(text))
+    if not text.endswith('\n'):
+        line_offsets.append(len(text))
+
+    store = TokenStore(text)
+    boundaries = array('I', [0])
+    depth = 0
+    line_start = True
+    decorating = False
+    for tk in generate_tokens_from_source(text):
+        typ = tk.type
+        if typ in tokens_to_ignore:
+            continue
+
+        if typ == tokenize.INDENT:
+            depth += 1
+        elif typ == tokenize.DEDENT:
+            depth -= 1
+        elif line_start and not depth:
+            if len(store) != boundaries[-1] and not decorating \
+                    and tk.string not in _continuation_keywords:
+                boundaries.append(len(store))
+            decorating = tk.string == '@'
+
+        line_start = typ in (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT)
+
+        interned = _interning_table.get(tk[:2])
+        name = interned[0] if interned is not None else _token_names[typ]
+        (start_line, start_col), (end_line, end_col) = tk.start, tk.end
+        store.append(name, line_offsets[start_line] + start_col,
+                     line_offsets[end_line] + end_col, start_line, start_col)
+
+    if len(store) != boundaries[-1]:
+        boundaries.append(len(store))
+    return store, boundaries
+
+
+def lex_statements(text: t.Union[str, bytes]) -> t.Iterator[t.Tuple[Tokenizer, ...]]:
+    """
+    yield the tokens of each top-level statement of `text` as a tuple.
+
+    Top-level statements are parsed independently, so only the `Tokenizer` objects of
+    one statement are alive at a time, the whole file is kept in a compact `TokenStore`.
+    """
+    store, boundaries = lex_store(text)
+    for start, stop in zip(boundaries, boundaries[1:]):
+        yield store.take(start, stop)
 
 
-python = Language('python')
-python.namespace.update({**extended_ast.__dict__, **helper.__dict__, **ast.__dict__})
-build_language(RBNF, python, '<grammar>')
+_namespace = {**extended_ast.__dict__, **helper.__dict__, **ast.__dict__}
+
+_grammar_digest = hashlib.sha1(
+    (RBNF + rbnf_version + yapypy_version).encode()).hexdigest()[:16]
+_grammar_cache_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '__pycache__',
+    f'grammar_{_grammar_digest}.py')
+
+
+def _load_dumped_language(path: str) -> Language:
+    spec = importlib.util.spec_from_file_location(f'_yapypy_grammar_{_grammar_digest}', path)
+    module = importlib.util.module_from_spec(spec)
+    # rewrite functions of dumped parsers take the module as their global scope.
+    module.__dict__.update((k, v) for k, v in _namespace.items() if not k.startswith('__'))
+    spec.loader.exec_module(module)
+    lang: Language = module.python
+    lang.namespace.update(_namespace)
+    lang.build()
+    return lang
+
+
+def load_language() -> Language:
+    """
+    build the language from `grammar.RBNF`.
+
+    The built language is serialized by `Language.dumps` as a python module which is
+    cached under `__pycache__`, keyed by the hash of the grammar, rbnf and yapypy versions.
+    Loading the cached module avoids parsing the grammar again on the next start.
+    """
+    if os.path.exists(_grammar_cache_path):
+        try:
+            return _load_dumped_language(_grammar_cache_path)
+        except Exception:
+            # broken or incompatible cache, build from the grammar.
+            pass
+
+    # the rbnf bootstrap parser is only required when the grammar is not cached.
+    from rbnf.bootstrap.rbnf import build_language
+
+    lang = Language('python')
+    lang.namespace.update(_namespace)
+    build_language(RBNF, lang, '<grammar>')
+
+    if not sys.dont_write_bytecode:
+        dumped, _ = lang.dumps().rsplit(f'{lang.lang_name}.build()', 1)
+        try:
+            write_atomic(_grammar_cache_path, dumped.encode())
+        except OSError:
+            pass
+    return lang
+
+
+python = load_language()
+memoize(python.implementation)
 python_parser = python.named_parsers['file_input']
-python.as_fixed()
+stmt_parser = python.named_parsers['stmt']
+
+
+# Staging the parsers with `fix_grammar` takes about 20 seconds and then saves about 28%
+# of parsing, which costs about 0.1 second per KB of source: a process pays it off from
+# about 700KB of sources.
+stage_grammar_bytes = 768 * 1024
+
+_staged = False
+_parsed_bytes = 0
+
+
+def fix_grammar():
+    """
+    stage every parser of the grammar with `Language.as_fixed`, once per process.
+
+    Staging is slow(around 20 seconds) and saves roughly 28% of parsing, so it only pays
+    off in long-running processes such as `yapypy watch`, or once enough sources are
+    parsed(see `note_parsed`).
+    """
+    global _staged
+    if not _staged:
+        python.as_fixed()
+        _staged = True
+
+
+def note_parsed(n_bytes: int):
+    """
+    count `n_bytes` of sources about to be parsed by this process, and stage the parsers
+    with `fix_grammar` once `stage_grammar_bytes` are counted.
+
+    title: lazy staging
+    test:
+    >>> from yapypy.extended_python import parser
+    >>> saved = parser._staged, parser._parsed_bytes
+    >>> staged = []
+    >>> parser.python.as_fixed = lambda: staged.append(True)
+    >>> try:
+    >>>     parser._staged, parser._parsed_bytes = False, 0
+    >>>     parser.note_parsed(parser.stage_grammar_bytes - 1)
+    >>>     assert not staged
+    >>>     parser.note_parsed(1)
+    >>>     parser.note_parsed(1)
+    >>>     assert staged == [True]
+    >>> finally:
+    >>>     del parser.python.as_fixed
+    >>>     parser._staged, parser._parsed_bytes = saved
+    """
+    global _parsed_bytes
+    _parsed_bytes += n_bytes
+    if _parsed_bytes >= stage_grammar_bytes:
+        fix_grammar()
 
 
 def _find_error(source_code, tokens, state):
@@ -81,15 +308,106 @@ def _find_error(source_code, tokens, state):
     raise RuntimeError
 
 
-def parse(text, filename=None):
+def _incomplete_error(source_code, tokens, state, filename) -> SyntaxError:
+    """
+    title: incomplete statements
+    test:
+    >>> from yapypy.extended_python.parser import parse
+    >>> try:
+    >>>     parse('x = 1\\ny = (1 2)\\n', 'm.py')
+    >>>     raise AssertionError
+    >>> except SyntaxError as e:
+    >>>     assert (e.filename, e.lineno, e.offset, e.text) == ('m.py', 2, 9, 'y = (1 2)\\n')
+    """
+    max_fetched = state.max_fetched
+    if max_fetched >= len(tokens):
+        tk = tokens[-1]
+        description = 'Incomplete syntax'
+    else:
+        tk = tokens[max_fetched]
+        description = 'Error'
+    lines = source_code.splitlines(True)
+    text = lines[tk.lineno - 1] if tk.lineno <= len(lines) else ''
+    return SyntaxError(f'{description} at line {tk.lineno}, col {tk.colno}',
+                       (filename or '<unknown>', tk.lineno, tk.colno + 1, text))
+
+
+def _fix_missing_locations(node: ast.AST) -> ast.AST:
+    """
+    `ast.fix_missing_locations` with a stack instead of the recursion, which long
+    expressions such as the sums of thousands of terms would exhaust.
+
+    title: locations of long expressions
+    test:
+    >>> import ast
+    >>> from yapypy.extended_python.parser import parse
+    >>> expr = parse('x = 1\\ny = ' + ' + '.join(['a'] * 1500)).result.body[1].value
+    >>> while isinstance(expr, ast.BinOp):
+    >>>     assert expr.lineno == 2
+    >>>     expr = expr.left
+    >>> assert (expr.lineno, expr.col_offset) == (2, 4)
+    """
+    stack = [(node, 1, 0)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node, lineno, col_offset = pop()
+        attributes = node._attributes
+        if 'lineno' in attributes:
+            if not hasattr(node, 'lineno'):
+                node.lineno = lineno
+            else:
+                lineno = node.lineno
+        if 'col_offset' in attributes:
+            if not hasattr(node, 'col_offset'):
+                node.col_offset = col_offset
+            else:
+                col_offset = node.col_offset
+        for child in ast.iter_child_nodes(node):
+            push((child, lineno, col_offset))
+    return node
+
+
+def parse(text, filename=None, memo=True):
+    """
+    parse the top-level statements one by one and join them into a module.
+
+    Each statement must be parsed completely, otherwise a `SyntaxError` pointing at the
+    furthest token the parser reached is raised, so `rbnf_analyze.check_parsing_complete`
+    is not required on the result. The returned `state` and `tokens` are those of the
+    last statement.
+
+    With `memo`, the hot rules(see `memo.hot_rules`) are memoized per statement, which
+    keeps deeply nested literals from going exponential.
+
+    title: packrat memoization
+    test:
+    >>> import ast
+    >>> from yapypy.extended_python.parser import parse
+    >>> src = 'x = ' + '{' * 6 + '1' + '}' * 6 + '\\nf(*a, k={b: {c}}, **d)\\n[x for x in {y}]'
+    >>> assert ast.dump(parse(src).result) == ast.dump(parse(src, memo=False).result)
+    >>> nested = parse('{' * 7 + '1' + '}' * 7).result.body[0].value
+    >>> assert ast.dump(nested) == ast.dump(ast.parse('{' * 7 + '1' + '}' * 7).body[0].value)
+    """
     text = text + '\n'  # as a workaround
-    tokens = tuple(lex(text))
-    state = State(python.implementation, filename=filename)
-    try:
-        parsed = python_parser.match(tokens, state)
-        return ze.ResultDescription(state, parsed.value, tokens)
-    except SyntaxError as e:
-        e.filename = filename or '<unknown>'
-        e.offset, e.text = _find_error(text, tokens, state)
-        e.__traceback__ = None
-        raise e
+    body = []
+    for tokens in lex_statements(text):
+        state = (MemoState if memo else State)(python.implementation, filename=filename)
+        # `file_input` would try yet another statement after the last one of each
+        # chunk, only the leading NEWLINE and the ENDMARKER need it.
+        top_level = tokens[0].name in ('NEWLINE', 'ENDMARKER')
+        try:
+            parsed = (python_parser if top_level else stmt_parser).match(tokens, state)
+        except SyntaxError as e:
+            e.filename = filename or '<unknown>'
+            e.offset, e.text = _find_error(text, tokens, state)
+            e.__traceback__ = None
+            raise e
+
+        if state.end_index < len(tokens):
+            raise _incomplete_error(text, tokens, state, filename)
+        body.extend(parsed.value.body if top_level else parsed.value)
+
+    mod = ast.Module(body)
+    _fix_missing_locations(mod)
+    return ze.ResultDescription(state, mod, tokens)
@@ -0,0 +1,202 @@
+"""
+opt-in instrumentation of the phases of compiling a module.
+
+    with Profile() as profile:
+        code = compile_ex_python_from_filename('a.py')
+    print(profile.report())
+
+Each phase run while a `Profile` is active is recorded as a `PhaseRecord`: the module,
+the wall time, the memory blocks allocated and not freed by the phase, and counters such
+as the number of AST nodes or instructions. Without an active `Profile`, entering a phase
+costs a check of `enabled()`.
+"""
+import ast
+import sys
+import time
+import types
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+
+class PhaseRecord:
+    __slots__ = ('phase', 'module', 'seconds', 'blocks', 'counters')
+
+    def __init__(self, phase: str, module: str):
+        self.phase = phase
+        self.module = module
+        self.seconds = 0.0
+        self.blocks = 0
+        self.counters = OrderedDict()
+
+    def count(self, **counters: int):
+        for name, n in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def __repr__(self):
+        counters = ''.join(f', {name}={n}' for name, n in self.counters.items())
+        return (f'PhaseRecord({self.phase}, {self.module}, seconds={self.seconds:.6f}, '
+                f'blocks={self.blocks}{counters})')
+
+
+class _NullRecord(PhaseRecord):
+    __slots__ = ()
+
+    def count(self, **counters: int):
+        pass
+
+
+class _Phase:
+    __slots__ = ('record', 'start', 'blocks')
+
+    def __init__(self, record: PhaseRecord):
+        self.record = record
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        record = self.record
+        record.seconds = time.perf_counter() - self.start
+        record.blocks = sys.getallocatedblocks() - self.blocks
+        if exc_type is None:
+            for each in _profiles:
+                each.add(record)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _null_record
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_null_record = _NullRecord('', '')
+_null_phase = _NullPhase()
+
+# the active profiles, innermost last.
+_profiles: List['Profile'] = []
+
+
+def enabled() -> bool:
+    """
+    whether any `Profile` is active, counters expensive to compute are only worth it then.
+    """
+    return bool(_profiles)
+
+
+def phase(name: str, module: str = '<unknown>'):
+    """
+    a context manager timing the phase `name` of compiling `module`, which gives
+    the `PhaseRecord` to add counters to.
+
+    title: profiling phases
+    test:
+    >>> from yapypy.extended_python.profiling import Profile, phase
+    >>> from yapypy.extended_python.parser import parse
+    >>> from yapypy.extended_python.py_compile import py_compile
+    >>> with phase('parse') as record:
+    >>>     record.count(nodes=1)
+    >>> assert not record.counters
+    >>> seen = []
+    >>> with Profile(callback=seen.append) as profile:
+    >>>     with phase('parse', 'm.py') as record:
+    >>>         record.count(nodes=2)
+    >>>         tree = parse('x = [i * 2 for i in range(3)]\\n').result
+    >>>     code = py_compile(tree, 'm.py')
+    >>> assert [each.phase for each in profile.records] == ['parse', 'to_tagged_ast', 'py_emit', 'to_code']
+    >>> assert seen == profile.records and profile.records[0].counters['nodes'] == 2
+    >>> assert profile.summary()['to_code'].counters['code_objects'] == 2
+    >>> assert 'py_emit' in profile.report()
+    """
+    if not _profiles:
+        return _null_phase
+    return _Phase(PhaseRecord(name, module))
+
+
+class Profile:
+    """
+    records the phases run while it is active, `callback` is called with each record.
+    """
+
+    def __init__(self, callback: Optional[Callable[[PhaseRecord], None]] = None):
+        self.records: List[PhaseRecord] = []
+        self.callback = callback
+
+    def add(self, record: PhaseRecord):
+        self.records.append(record)
+        if self.callback:
+            self.callback(record)
+
+    def __enter__(self):
+        _profiles.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _profiles.remove(self)
+
+    def _merge(self, key) -> 'OrderedDict[str, PhaseRecord]':
+        merged = OrderedDict()
+        for record in self.records:
+            name = key(record)
+            total = merged.get(name)
+            if total is None:
+                total = merged[name] = PhaseRecord(record.phase, record.module)
+            total.seconds += record.seconds
+            total.blocks += record.blocks
+            total.count(**record.counters)
+        return merged
+
+    def summary(self) -> 'OrderedDict[str, PhaseRecord]':
+        """
+        the records of each phase summed up over the modules.
+        """
+        return self._merge(lambda record: record.phase)
+
+    def per_module(self) -> 'OrderedDict[str, PhaseRecord]':
+        """
+        the records of each module summed up over the phases.
+        """
+        return self._merge(lambda record: record.module)
+
+    def report(self, top: int = 10) -> str:
+        """
+        a table of the phases, followed by the `top` slowest modules.
+        """
+        phases = self.summary()
+        total = sum(each.seconds for each in phases.values()) or 1.0
+        lines = [f'{"phase":24}{"seconds":>10}{"%":>7}{"blocks":>12}  counters']
+        for name, each in phases.items():
+            counters = ', '.join(f'{counter}={n}' for counter, n in each.counters.items())
+            lines.append(f'{name:24}{each.seconds:10.3f}{each.seconds / total:7.1%}'
+                         f'{each.blocks:12}  {counters}')
+
+        modules = sorted(self.per_module().values(), key=lambda each: -each.seconds)
+        if modules:
+            lines.append('')
+            lines.append(f'{"slowest modules":60}{"seconds":>10}')
+            lines.extend(f'{each.module[-60:]:60}{each.seconds:10.3f}' for each in modules[:top])
+        return '\n'.join(lines)
+
+
+def count_nodes(node: ast.AST) -> int:
+    return sum(1 for _ in ast.walk(node))
+
+
+def code_counters(code: types.CodeType) -> 'OrderedDict[str, int]':
+    """
+    the numbers of code objects and instructions in `code` and its nested code objects.
+    """
+    counters = OrderedDict(code_objects=0, instructions=0)
+    codes = [code]
+    while codes:
+        each = codes.pop()
+        counters['code_objects'] += 1
+        # every instruction takes 2 bytes since python 3.6.
+        counters['instructions'] += len(each.co_code) // 2
+        codes.extend(const for const in each.co_consts if isinstance(const, types.CodeType))
+    return counters
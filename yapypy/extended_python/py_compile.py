@@ -1,4 +1,5 @@
 from yapypy.extended_python.emit_impl import *
+from yapypy.extended_python import profiling
 from os.path import splitext
 from Redy.Tools.PathLib import Path
 
@@ -12,16 +13,22 @@ def py_compile(node, filename='<unknown>', is_entrypoint=False):
         ctx.bc.name = '__main__' if is_entrypoint else splitext(
             Path(filename).relative())[0]
         try:
-            py_emit(node.it, ctx)
+            with profiling.phase('py_emit', filename):
+                py_emit(node.it, ctx)
         except SyntaxError as exc:
             exc.filename = filename
             raise exc
-        return ctx.bc.to_code()
+        with profiling.phase('to_code', filename) as record:
+            code = ctx.to_code()
+        if profiling.enabled():
+            record.count(**profiling.code_counters(code))
+        return code
         # try:
         #     return ctx.bc.to_code()
         # except Exception as e:
         #     dump_bytecode(ctx.bc)
         #     raise e
     else:
-        tag = to_tagged_ast(node)
+        with profiling.phase('to_tagged_ast', filename):
+            tag = to_tagged_ast(node)
         return py_compile(tag, filename, is_entrypoint=is_entrypoint)
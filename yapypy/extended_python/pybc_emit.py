@@ -1,15 +1,13 @@
 import ast
-import dis
 import sys
 import typing
 from typing import NamedTuple
-from astpretty import pprint
 import yapypy.extended_python.extended_ast as ex_ast
 from yapypy.extended_python.symbol_analyzer import SymTable, Tag, to_tagged_ast, ContextType
-from yapypy.utils.namedlist import INamedList, as_namedlist, trait
+from yapypy.utils.namedlist import INamedList, as_slots, trait
 from yapypy.utils.instrs import *
 
-from Redy.Magic.Pattern import Pattern
+from yapypy.utils.type_dispatch import type_dispatch
 from bytecode import *
 from bytecode.concrete import FreeVar, CellVar, Compare
 from bytecode.flags import CompilerFlags
@@ -33,19 +31,135 @@ class IndexedAnalyzedSymTable(NamedTuple):
         return cls(*[list(each) for each in tb.analyzed])
 
 
-class Context(INamedList, metaclass=trait(as_namedlist)):
+def compute_stacksize(cfg: ControlFlowGraph) -> int:
+    """
+    `ControlFlowGraph.compute_stacksize` with a stack of the blocks being walked instead
+    of the recursion, which the thousands of blocks of a long `or` chain would exhaust.
+    The blocks are walked in the same order, for the same result.
+    """
+    if not cfg:
+        return 0
+
+    for block in cfg:
+        block.seen = False
+        block.startsize = -32768  # INT_MIN
+
+    # [block, its instructions left, size, jump whose taken path is being walked].
+    # `leave` for the jump means the block is done once the path is walked.
+    leave = object()
+    maxsize = 0
+    frames = []
+
+    def enter(block, size):
+        if block.seen or block.startsize >= size:
+            return
+        block.seen = True
+        block.startsize = size
+        frames.append([block, iter(block), size, None])
+
+    def update_size(delta, size):
+        size += delta
+        if size < 0:
+            raise RuntimeError('Failed to compute stacksize, got negative size')
+        return size
+
+    enter(cfg[0], 0)
+    while frames:
+        frame = frames[-1]
+        block, instrs, size, jump = frame
+        if jump is leave:
+            block.seen = False
+            frames.pop()
+            continue
+        if jump is not None:
+            # the path not taken of a conditional jump
+            size = update_size(jump.stack_effect(jump=False), size)
+            maxsize = max(maxsize, size)
+            frame[3] = None
+
+        for instr in instrs:
+            if isinstance(instr, SetLineno):
+                continue
+
+            if instr.has_jump():
+                # first compute the taken-jump path
+                taken_size = update_size(instr.stack_effect(jump=True), size)
+                maxsize = max(maxsize, taken_size)
+                frame[2] = size
+                frame[3] = leave if instr.is_uncond_jump() else instr
+                enter(instr.arg, taken_size)
+                break
+
+            size = update_size(instr.stack_effect(jump=False), size)
+            maxsize = max(maxsize, size)
+        else:
+            frame[3] = leave
+            if block.next_block:
+                enter(block.next_block, size)
+
+    return maxsize
+
+
+class NameInstrs(NamedTuple):
+    load: str
+    store: str
+    delete: str
+    arg: typing.Union[str, CellVar, FreeVar]
+
+
+def resolve_names(sym_tb: IndexedAnalyzedSymTable,
+                  under_class: bool) -> typing.Dict[str, NameInstrs]:
+    """
+    the instructions accessing each name of a context, the names missing are globals.
+    A cell variable shadows a free variable, which shadows a bound one.
+
+    title: name resolution
+    test:
+    >>> from yapypy.extended_python.parser import parse
+    >>> from yapypy.extended_python.py_compile import py_compile
+    >>> assigns = ''.join(f'    v{i} = {i}\\n' for i in range(100))
+    >>> src = ('def f():\\n' + assigns +
+    >>>        '    def g():\\n        return v0 + v99\\n'
+    >>>        '    class C:\\n        u = v1\\n        w = v2 + len\\n'
+    >>>        '    del v3\\n'
+    >>>        '    return g() + C.u + C.w + sum([v4, v5])\\n')
+    >>> namespace = {'len': 10}
+    >>> exec(py_compile(parse(src).result), namespace)
+    >>> assert namespace['f']() == 0 + 99 + 1 + (2 + 10) + (4 + 5)
+    >>> code = namespace['f'].__code__
+    >>> assert set(code.co_cellvars) == {'v0', 'v99', 'v1', 'v2'}
+    >>> assert {'v3', 'v50'} <= set(code.co_varnames) and code.co_names == ('u', 'w', 'sum')
+    """
+    if under_class:
+        load_deref = 'LOAD_CLASSDEREF'
+        fast = ('LOAD_NAME', 'STORE_NAME', 'DELETE_NAME')
+    else:
+        load_deref = 'LOAD_DEREF'
+        fast = ('LOAD_FAST', 'STORE_FAST', 'DELETE_FAST')
+
+    names = {name: NameInstrs(*fast, name) for name in sym_tb.bounds}
+    names.update((name, NameInstrs(load_deref, 'STORE_DEREF', 'DELETE_DEREF', FreeVar(name)))
+                 for name in sym_tb.freevars)
+    # TODO: no DELETE_CLASSDEREF?
+    names.update((name, NameInstrs(load_deref, 'STORE_DEREF', 'DELETE_DEREF', CellVar(name)))
+                 for name in sym_tb.cellvars)
+    return names
+
+
+class Context(INamedList, metaclass=trait(as_slots)):
     bc: Bytecode
     sym_tb: IndexedAnalyzedSymTable
     parent: 'Context'
     current_block_stack: list
     cts: typing.FrozenSet[ContextType]
+    names: typing.Dict[str, NameInstrs]
 
     def enter_new(self, tag_table: SymTable):
         sym_tb = IndexedAnalyzedSymTable.from_raw(tag_table)
         bc = Bytecode()
         try:
             bc.filename = self.bc.filename
-        except IndexError:
+        except AttributeError:
             bc.filename = ""
 
         cts = tag_table.cts
@@ -92,71 +206,52 @@ class Context(INamedList, metaclass=trait(as_namedlist)):
             sym_tb=sym_tb,
             current_block_stack=[],
             cts=frozenset(cts),
+            names=resolve_names(sym_tb, ContextType.ClassDef in cts),
         )
 
     def load_name(self, name, lineno=None):
-        sym_tb = self.sym_tb
-        under_class = ContextType.ClassDef in self.cts
-        if name in sym_tb.cellvars:
-            self.bc.append(
-                Instr(
-                    'LOAD_CLASSDEREF' if under_class else 'LOAD_DEREF',
-                    CellVar(name),
-                    lineno=lineno))
-        elif name in sym_tb.freevars:
-            self.bc.append(
-                Instr(
-                    'LOAD_CLASSDEREF' if under_class else 'LOAD_DEREF',
-                    FreeVar(name),
-                    lineno=lineno))
-        elif name in sym_tb.bounds:
-            self.bc.append(
-                Instr('LOAD_NAME' if under_class else 'LOAD_FAST', name, lineno=lineno))
-        else:
+        instrs = self.names.get(name)
+        if instrs is None:
             self.bc.append(Instr("LOAD_GLOBAL", name, lineno=lineno))
+        else:
+            self.bc.append(Instr(instrs.load, instrs.arg, lineno=lineno))
 
     def del_name(self, name, lineno=None):
-        sym_tb = self.sym_tb
-        if name in sym_tb.cellvars:
-            # TODO: no DELETE_CLASSDEREF?
-            self.bc.append(Instr('DELETE_DEREF', CellVar(name), lineno=lineno))
-        elif name in sym_tb.freevars:
-            self.bc.append(Instr('DELETE_DEREF', FreeVar(name), lineno=lineno))
-        elif name in sym_tb.bounds:
-            under_class = ContextType.ClassDef in self.cts
-            self.bc.append(
-                Instr(
-                    'DELETE_NAME' if under_class else 'DELETE_FAST', name, lineno=lineno))
-        else:
+        instrs = self.names.get(name)
+        if instrs is None:
             self.bc.append(Instr("DELETE_GLOBAL", name, lineno=lineno))
+        else:
+            self.bc.append(Instr(instrs.delete, instrs.arg, lineno=lineno))
 
     def store_name(self, name, lineno=None):
-        sym_tb = self.sym_tb
-        if name in sym_tb.cellvars:
-            self.bc.append(Instr('STORE_DEREF', CellVar(name), lineno=lineno))
-        elif name in sym_tb.freevars:
-            self.bc.append(Instr('STORE_DEREF', FreeVar(name), lineno=lineno))
-        elif name in sym_tb.bounds:
-            under_class = ContextType.ClassDef in self.cts
-            self.bc.append(
-                Instr('STORE_NAME' if under_class else 'STORE_FAST', name, lineno=lineno))
-        else:
+        instrs = self.names.get(name)
+        if instrs is None:
             self.bc.append(Instr("STORE_GLOBAL", name, lineno=lineno))
+        else:
+            self.bc.append(Instr(instrs.store, instrs.arg, lineno=lineno))
 
     def load_closure(self, lineno=None):
         parent = self.parent
         freevars = self.sym_tb.freevars
-        cellvars = parent.sym_tb.cellvars
+        parent_names = parent.names
 
         for each in freevars:
-            if each in cellvars:
-                parent.bc.append(Instr('LOAD_CLOSURE', CellVar(each), lineno=lineno))
+            instrs = parent_names.get(each)
+            if instrs is not None and isinstance(instrs.arg, CellVar):
+                parent.bc.append(Instr('LOAD_CLOSURE', instrs.arg, lineno=lineno))
             else:
-                assert each in freevars
                 parent.bc.append(Instr('LOAD_CLOSURE', FreeVar(each), lineno=lineno))
 
         parent.bc.append(Instr('BUILD_TUPLE', len(freevars)))
 
+    def to_code(self):
+        """
+        the code object of the bytecode emitted, see `compute_stacksize`.
+        """
+        concrete = self.bc.to_concrete_bytecode()
+        cfg = ControlFlowGraph.from_bytecode(concrete.to_bytecode())
+        return concrete.to_code(stacksize=compute_stacksize(cfg))
+
     def push_current_block(self, blktype: BlockType, label: Label = None):
         item = (blktype, label)
         self.current_block_stack.append(item)
@@ -184,6 +279,6 @@ class Context(INamedList, metaclass=trait(as_namedlist)):
         return ContextType.Module in self.cts
 
 
-@Pattern
+@type_dispatch
 def py_emit(node: ast.AST, ctx: Context):
     return type(node)
@@ -1,30 +1,134 @@
+import os
 import sys
 import types
 from importlib.abc import MetaPathFinder
 from importlib.machinery import ModuleSpec
+from importlib.util import decode_source
 
-from Redy.Tools.PathLib import Path
-from rbnf.edsl.rbnf_analyze import check_parsing_complete
 
-from yapypy.extended_python.parser import parse
+from yapypy.extended_python import profiling
+from yapypy.extended_python.bytecode_cache import load_cached_code, store_code
+from yapypy.extended_python.parser import note_parsed, parse
 from yapypy.extended_python.py_compile import py_compile
 
 is_debug = False
 
+# Opt-in scoping of the finder. When both are empty every import is searched;
+# otherwise only modules under the listed top-level packages, or located in
+# directories under the listed path prefixes, are handled by YAPyPy.
+package_roots = set()
+path_prefixes = []
+
+# (fullname, search paths) known to be absent, dropped by `invalidate_caches`.
+_missing = set()
+
+
+def scope(*roots: str, prefixes=()):
+    """
+    restrict the finder to the given top-level packages and path prefixes.
+    """
+    package_roots.update(roots)
+    path_prefixes.extend(os.path.abspath(each) for each in prefixes)
+    YAPyPyFinder.invalidate_caches()
+
+
+def _under_prefixes(path: str) -> bool:
+    path = os.path.abspath(path or os.curdir)
+    for prefix in path_prefixes:
+        try:
+            if os.path.commonpath([path, prefix]) == prefix:
+                return True
+        except ValueError:
+            # on different drives.
+            continue
+    return False
+
+
+def _in_scope(fullname: str, paths):
+    """
+    the search paths of `paths` where YAPyPy looks for `fullname`.
+
+    title: finder scoping
+    prepare:
+    >>> import os, sys, tempfile
+    >>> from yapypy.extended_python import pycompat
+    >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+    test:
+    >>> saved = set(pycompat.package_roots), list(pycompat.path_prefixes)
+    >>> tmp = tempfile.mkdtemp()
+    >>> foo, bar, barbaz = (os.path.join(tmp, each) for each in ('foo', 'bar', 'barbaz'))
+    >>> try:
+    >>>     pycompat.package_roots.clear()
+    >>>     pycompat.path_prefixes[:] = []
+    >>>     pycompat.scope('yapypy_scoped', prefixes=[bar + os.sep])
+    >>>     assert pycompat.path_prefixes == [bar]
+    >>>     paths = [foo, bar, barbaz, os.path.join(bar, 'sub')]
+    >>>     assert pycompat._in_scope('yapypy_scoped.sub', paths) == paths
+    >>>     assert pycompat._in_scope('os', paths) == [bar, os.path.join(bar, 'sub')]
+    >>>     assert pycompat.YAPyPyFinder.find_spec('os', [foo, barbaz]) is None
+    >>> finally:
+    >>>     pycompat.package_roots.clear()
+    >>>     pycompat.package_roots.update(saved[0])
+    >>>     pycompat.path_prefixes[:] = saved[1]
+    """
+    if fullname.partition('.')[0] in package_roots:
+        return paths
+    if not path_prefixes:
+        return ()
+    return [each for each in paths if _under_prefixes(each)]
+
 
 class YAPyPyFinder(MetaPathFinder):
 
     @classmethod
     def find_spec(cls, fullname: str, paths, target=None):
+        """
+        the spec of `fullname` under `paths`, `sys.path` by default. A module not found is
+        not searched for again until `invalidate_caches`.
+
+        title: negative lookup cache
+        prepare:
+        >>> import os, sys, tempfile
+        >>> from yapypy.extended_python import pycompat
+        >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+        test:
+        >>> tmp = tempfile.mkdtemp()
+        >>> finder = pycompat.YAPyPyFinder
+        >>> assert finder.find_spec('yapypy_absent', [tmp]) is None
+        >>> assert ('yapypy_absent', (tmp, )) in pycompat._missing
+        >>> with open(os.path.join(tmp, 'yapypy_absent.py'), 'w') as fw:
+        >>>     fw.write('x = 1')
+        >>> assert finder.find_spec('yapypy_absent', [tmp]) is None
+        >>> finder.invalidate_caches()
+        >>> spec = finder.find_spec('yapypy_absent', [tmp])
+        >>> assert spec.origin == os.path.join(tmp, 'yapypy_absent.py')
+        """
         paths = paths if isinstance(
             paths, list,
         ) else [paths] if isinstance(
             paths, str,
         ) else sys.path
 
+        if package_roots or path_prefixes:
+            paths = _in_scope(fullname, paths)
+            if not paths:
+                return None
+
+        key = (fullname, tuple(paths))
+        if key in _missing:
+            return None
+
         if is_debug:
             print(f'Searching module {fullname} from {paths[:5]}...')
-        return find_yapypy_module_spec(fullname, paths)
+        spec = find_yapypy_module_spec(fullname, paths)
+        if spec is None:
+            _missing.add(key)
+        return spec
+
+    @classmethod
+    def invalidate_caches(cls):
+        _path_cache.clear()
+        _missing.clear()
 
 
 class YAPyPyLoader:
@@ -44,7 +148,7 @@ class YAPyPyLoader:
         exec(bc, module.__dict__)
 
     def create_module(self, spec):
-        bc: types.CodeType = spec.__bytecode__
+        bc: types.CodeType = self.get_code(self.mod_name)
         doc = None
         if len(bc.co_consts) and isinstance(bc.co_consts[0], str):
             doc = bc.co_consts[0]
@@ -52,23 +156,139 @@ class YAPyPyLoader:
         mod.__bytecode__ = bc
         return mod
 
+    def get_code(self, fullname) -> types.CodeType:
+        """
+        load the code object from the bytecode cache, or compile it when the cache is missing
+        or outdated. Nothing is compiled until the module is going to be executed.
+
+        title: lazy compilation
+        prepare:
+        >>> import importlib.util, os, sys, tempfile
+        >>> from yapypy.extended_python import profiling, pycompat
+        >>> from yapypy.extended_python.bytecode_cache import cache_path
+        >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+        test:
+        >>> dont_write_bytecode = sys.dont_write_bytecode
+        >>> sys.dont_write_bytecode = False
+        >>> tmp = tempfile.mkdtemp()
+        >>> filename = os.path.join(tmp, 'yapypy_lazy.py')
+        >>> def load(source):
+        >>>     if source is not None:
+        >>>         with open(filename, 'w') as fw:
+        >>>             fw.write(source)
+        >>>     with profiling.Profile() as profile:
+        >>>         spec = pycompat.find_yapypy_module_spec('yapypy_lazy', [tmp])
+        >>>         assert 'parse' not in profile.summary()
+        >>>         module = importlib.util.module_from_spec(spec)
+        >>>         spec.loader.exec_module(module)
+        >>>     return module.answer, 'parse' in profile.summary()
+        >>> try:
+        >>>     assert load('value = (answer := 1)') == (1, True)
+        >>>     assert os.path.exists(cache_path(filename))
+        >>>     assert load(None) == (1, False)
+        >>>     assert load('value = (answer := 22)') == (22, True)
+        >>>     assert load(None) == (22, False)
+        >>> finally:
+        >>>     sys.dont_write_bytecode = dont_write_bytecode
+        """
+        module_path = self.mod_path
+        with open(module_path, 'rb') as fr:
+            st = os.fstat(fr.fileno())
+            bc = load_cached_code(module_path, st)
+            if bc is not None:
+                return bc
+
+            source_bytes = fr.read()
+            bc = load_cached_code(module_path, st, source_bytes)
+            if bc is not None:
+                # only the timestamp changed, refresh the header.
+                store_code(module_path, st, source_bytes, bc)
+                return bc
+
+        if is_debug:
+            print(f'compiling module {fullname} at {module_path}.')
+        source = decode_source(source_bytes)
+        note_parsed(len(source))
+        with profiling.phase('parse', module_path) as record:
+            result = parse(source, module_path)
+        if profiling.enabled():
+            record.count(bytes=len(source), nodes=profiling.count_nodes(result.result))
+
+        bc = py_compile(result.result, filename=module_path, is_entrypoint=False)
+        store_code(module_path, st, source_bytes, bc)
+        return bc
+
+
+# directory -> (mtime, entries), refreshed when the directory mtime changes,
+# just like the `_path_cache` of `importlib.machinery.FileFinder`.
+_path_cache = {}
+
+
+def list_dir_cached(directory: str) -> frozenset:
+    """
+    the entries of `directory`, listed again only when its mtime changes.
+
+    title: directory listing cache
+    prepare:
+    >>> import os, sys, tempfile
+    >>> from yapypy.extended_python import pycompat
+    >>> sys.meta_path[:] = [each for each in sys.meta_path if not isinstance(each, pycompat.YAPyPyFinder)]
+    test:
+    >>> tmp = tempfile.mkdtemp()
+    >>> def touch(*names):
+    >>>     for name in names:
+    >>>         open(os.path.join(tmp, name), 'w').close()
+    >>> touch('a.py')
+    >>> assert pycompat.list_dir_cached(tmp) == {'a.py'}
+    >>> st = os.stat(tmp)
+    >>> touch('b.py')
+    >>> os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+    >>> assert pycompat.list_dir_cached(tmp) == {'a.py'}
+    >>> os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    >>> assert pycompat.list_dir_cached(tmp) == {'a.py', 'b.py'}
+    >>> assert pycompat.list_dir_cached(os.path.join(tmp, 'missing')) == frozenset()
+    >>> os.mkdir(os.path.join(tmp, 'pkg'))
+    >>> touch(os.path.join('pkg', '__init__.py'), os.path.join('pkg', 'mod.py'))
+    >>> spec = pycompat.find_yapypy_module_spec('pkg.mod', [tmp])
+    >>> assert spec.origin == os.path.join(tmp, 'pkg', 'mod.py')
+    >>> assert pycompat.find_yapypy_module_spec('pkg.absent', [tmp]) is None
+    """
+    try:
+        mtime = os.stat(directory).st_mtime
+    except OSError:
+        return frozenset()
+
+    cached = _path_cache.get(directory)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        entries = frozenset(os.listdir(directory))
+    except OSError:
+        entries = frozenset()
+
+    _path_cache[directory] = mtime, entries
+    return entries
+
 
 def find_yapypy_module_spec(names, paths):
     def try_find(prospective_path):
-        path_secs = (prospective_path, *names.split('.'))
+        path_secs = (prospective_path or os.getcwd(), *names.split('.'))
         *init, end = path_secs
-        directory = Path(*init)
-        if not directory.is_dir():
+        directory = os.path.join(*init)
+        entries = list_dir_cached(directory)
+        if not entries:
             return
-        for each in directory.list_dir():
-            each_path_str = each.relative()
-            # print(each_path_str, end)
-            if each_path_str == end + '.py':
-                module_path = directory.into(each_path_str)
-                yield get_yapypy_module_spec_from_path(names, str(module_path))
 
-            elif each_path_str == end and each.is_dir() and '__init__.py' in each:
-                yield from try_find(str(each))
+        module_filename = end + '.py'
+        if module_filename in entries:
+            module_path = os.path.join(directory, module_filename)
+            yield get_yapypy_module_spec_from_path(names, module_path)
+
+        elif end in entries:
+            package_path = os.path.join(directory, end)
+            if '__init__.py' in list_dir_cached(package_path):
+                yield from try_find(package_path)
 
     for each in paths:
         found = next(try_find(each), None)
@@ -77,17 +297,7 @@ def find_yapypy_module_spec(names, paths):
 
 
 def get_yapypy_module_spec_from_path(names, module_path):
-    with Path(module_path).open('r') as fr:
-        spec = ModuleSpec(names, YAPyPyLoader(names, module_path))
-        __source__ = fr.read()
-        result = parse(__source__, module_path)
-        check_parsing_complete(__source__, result.tokens, result.state)
-
-        __bytecode__ = py_compile(
-            result.result, filename=module_path, is_entrypoint=False)
-        spec.__source__ = __source__
-        spec.__bytecode__ = __bytecode__
-        return spec
+    return ModuleSpec(names, YAPyPyLoader(names, module_path), origin=module_path)
 
 
 sys.meta_path.insert(0, YAPyPyFinder())
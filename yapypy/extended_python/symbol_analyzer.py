@@ -1,9 +1,8 @@
 import ast
 import yapypy.extended_python.extended_ast as ex_ast
 import typing
-from yapypy.utils.namedlist import INamedList, as_namedlist, trait
+from yapypy.utils.namedlist import INamedList, as_slots, trait
 from typing import NamedTuple, List, Optional, Union
-from pprint import pformat
 from enum import Enum, auto as _auto
 
 
@@ -25,7 +24,7 @@ class AnalyzedSymTable(NamedTuple):
     cellvars: Optional[set]
 
 
-class SymTable(INamedList, metaclass=trait(as_namedlist)):
+class SymTable(INamedList, metaclass=trait(as_slots)):
     requires: set
     entered: set
     explicit_nonlocals: set
@@ -87,10 +86,6 @@ class SymTable(INamedList, metaclass=trait(as_namedlist)):
         self.children.append(new)
         return new
 
-    def can_resolve_by_parents(self, symbol: str):
-        return (symbol in self.analyzed.bounds
-                or self.parent and self.parent.can_resolve_by_parents(symbol))
-
     def resolve_bounds(self):
         enters = self.entered
         nonlocals = self.explicit_nonlocals
@@ -104,31 +99,26 @@ class SymTable(INamedList, metaclass=trait(as_namedlist)):
         self.analyzed = AnalyzedSymTable(bounds, set(), set())
         return bounds
 
-    def resolve_freevars(self):
-        enters = self.entered
-        requires = self.requires - enters
-        nonlocals = self.explicit_nonlocals
+    def resolve_freevars(self, resolvable: dict):
+        """
+        `resolvable` counts the tables enclosing this one which bind each name.
+        """
+        requires = self.requires - self.entered
         freevars = self.analyzed.freevars
         freevars.update(
-            nonlocals.union(
+            self.explicit_nonlocals.union(
                 {each
                  for each in requires
-                 if self.parent.can_resolve_by_parents(each)}))
-
+                 if each in resolvable}))
         return freevars
 
     def resolve_cellvars(self):
-
-        def fetched_from_outside(sym_tb: SymTable):
-            return sym_tb.analyzed.freevars.union(
-                *(each.analyze().analyzed.freevars for each in sym_tb.children),
-            )
-
         analyzed = self.analyzed
         cellvars = analyzed.cellvars
         bounds = analyzed.bounds
 
-        requires_from_sub_contexts = fetched_from_outside(self)
+        requires_from_sub_contexts = analyzed.freevars.union(
+            *(each.analyzed.freevars for each in self.children))
 
         cellvars.update(requires_from_sub_contexts.intersection(bounds))
         borrowed_freevars = (requires_from_sub_contexts - cellvars)
@@ -141,23 +131,79 @@ class SymTable(INamedList, metaclass=trait(as_namedlist)):
         return self.depth == 0
 
     def analyze(self):
+        """
+        resolve this table and its descendants in one traversal of the tables: the bounds
+        and free variables of a table are resolved on the way down, the names bound by the
+        enclosing tables being counted in a single dict, and its cell variables on the way
+        up, once its children are resolved.
+
+        title: symbol resolution
+        test:
+        >>> import ast
+        >>> from yapypy.extended_python.symbol_analyzer import to_tagged_ast
+        >>> depth = 60
+        >>> lines = [f'{"    " * i}def f{i}(a{i}):' for i in range(depth)]
+        >>> lines.append(f'{"    " * depth}return [a0 + a{depth - 1} + b for b in a1]')
+        >>> tag = to_tagged_ast(ast.parse('\\n'.join(lines) + '\\n'))
+        >>> tables = [tag.tag]
+        >>> while tables[-1].children:
+        >>>     tables.append(tables[-1].children[0])
+        >>> assert len(tables) == depth + 2
+        >>> outer, inner, comp = tables[1].analyzed, tables[-2].analyzed, tables[-1].analyzed
+        >>> assert (outer.bounds, outer.freevars, outer.cellvars) == ({'f1'}, set(), {'a0'})
+        >>> assert tables[2].analyzed.cellvars == {'a1'} and tables[2].analyzed.freevars == {'a0'}
+        >>> assert tables[3].analyzed.freevars == {'a0', 'a1'}
+        >>> assert inner.freevars == {'a0', 'a1'} and inner.cellvars == {f'a{depth - 1}'}
+        >>> assert comp == ({'.0', 'b'}, {'a0', f'a{depth - 1}'}, set())
+        """
         if self.analyzed is not None:
             return self
 
-        if self.is_global():
-            # global context
-            self.analyzed = AnalyzedSymTable(set(), set(), set())
-            for each in self.children:
-                each.analyze()
-            return self
-
-        # analyze local table.
-        self.resolve_bounds()
-        self.resolve_freevars()
-        self.resolve_cellvars()
+        resolvable = {}
+        parent = self.parent
+        while parent is not None:
+            if parent.analyzed is not None:
+                for each in parent.analyzed.bounds:
+                    resolvable[each] = resolvable.get(each, 0) + 1
+            parent = parent.parent
+
+        # (table, True) enters a table, (table, False) leaves it.
+        stack = [(self, True)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            table, entering = pop()
+            if not entering:
+                for each in table.analyzed.bounds:
+                    count = resolvable[each]
+                    if count == 1:
+                        del resolvable[each]
+                    else:
+                        resolvable[each] = count - 1
+                table.resolve_cellvars()
+                continue
+
+            if table.analyzed is not None:
+                continue
+
+            if table.is_global():
+                # global context
+                table.analyzed = AnalyzedSymTable(set(), set(), set())
+            else:
+                # the free variables are resolved by the enclosing tables only.
+                bounds = table.resolve_bounds()
+                table.resolve_freevars(resolvable)
+                for each in bounds:
+                    resolvable[each] = resolvable.get(each, 0) + 1
+                push((table, False))
+
+            children = table.children
+            for i in range(len(children) - 1, -1, -1):
+                push((children[i], True))
         return self
 
     def show_resolution(self):
+        from pprint import pformat
 
         def show_resolution(this):
             return [this.analyzed, [show_resolution(each) for each in this.children]]
@@ -344,6 +390,57 @@ def _visit_lam(self: 'ASTTagger', node: ast.Lambda):
     return Tag(node, new)
 
 
+def _transform_fields(node: ast.AST):
+    """
+    yield the children of `node` and replace each by the node sent back, as
+    `ast.NodeTransformer.generic_visit` does with the results of visiting them.
+    """
+    for field, old_value in ast.iter_fields(node):
+        if isinstance(old_value, list):
+            new_values = []
+            for value in old_value:
+                if isinstance(value, ast.AST):
+                    value = yield value
+                    if value is None:
+                        continue
+                    elif not isinstance(value, ast.AST):
+                        new_values.extend(value)
+                        continue
+                new_values.append(value)
+            old_value[:] = new_values
+        elif isinstance(old_value, ast.AST):
+            new_node = yield old_value
+            if new_node is None:
+                delattr(node, field)
+            else:
+                setattr(node, field, new_node)
+
+
+def _generic_visit(self: 'ASTTagger', node: ast.AST):
+    """
+    visit the children in the order `ast.NodeTransformer.generic_visit` does, but the
+    nodes without a specific visitor are entered on a stack instead of recursively, so
+    that long expressions do not hit the recursion limit.
+    """
+    frames = [(node, _transform_fields(node))]
+    result = None
+    while frames:
+        parent, fields = frames[-1]
+        try:
+            child = fields.send(result)
+        except StopIteration:
+            frames.pop()
+            result = parent
+            continue
+        visitor = getattr(self, 'visit_' + child.__class__.__name__, None)
+        if visitor is None:
+            frames.append((child, _transform_fields(child)))
+            result = None
+        else:
+            result = visitor(child)
+    return node
+
+
 class ASTTagger(ast.NodeTransformer):
 
     def __init__(self, symtable: SymTable):
@@ -367,6 +464,8 @@ class ASTTagger(ast.NodeTransformer):
     visit_ClassDef = _visit_cls
     visit_Await = _visit_await
 
+    generic_visit = _generic_visit
+
 
 def to_tagged_ast(node: ast.Module):
     global_table = SymTable.global_context()
@@ -0,0 +1,122 @@
+"""
+struct-of-arrays storage of the tokens of a source file.
+
+A token is kept as an interned name id, the offsets of its text in the source and its
+position, in `array` buffers, instead of a `Tokenizer` object per token. `Tokenizer`
+objects are only created for the tokens the parser is working on, see `TokenStore.take`.
+"""
+from array import array
+from typing import Sequence, Tuple
+
+from rbnf.core.CachingPool import ConstStrPool
+from rbnf.core.Tokenizer import Tokenizer
+
+cast = ConstStrPool.cast_to_const
+
+# `Tokenizer` is a namedtuple, skip its `__new__` written in python.
+_new_token = tuple.__new__
+
+# the values of these tokens are not interned, like `parser.to_rbnf_token` does.
+_plain_names = {'NAME', 'STRING', 'NUMBER'}
+
+
+class TokenStore:
+    __slots__ = ('source', 'names', 'name_ids', 'starts', 'ends', 'linenos', 'colnos',
+                 '_name_index', '_plain')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.names = []
+        self.name_ids = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.linenos = array('I')
+        self.colnos = array('I')
+        self._name_index = {}
+        self._plain = []
+
+    def append(self, name: str, start: int, end: int, lineno: int, colno: int):
+        """
+        add a token named `name` whose value is `source[start:end]`.
+        """
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            name_id = self._name_index[name] = len(self.names)
+            self.names.append(cast(name))
+            self._plain.append(name in _plain_names)
+
+        self.name_ids.append(name_id)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.linenos.append(lineno)
+        self.colnos.append(colno)
+
+    def __len__(self):
+        return len(self.name_ids)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError('TokenStore views are contiguous.')
+            return TokenView(self, start, max(start, stop))
+
+        if item < 0:
+            item += len(self)
+        name_id = self.name_ids[item]
+        value = self.source[self.starts[item]:self.ends[item]]
+        if not self._plain[name_id]:
+            value = cast(value)
+        return _new_token(Tokenizer,
+                          (self.names[name_id], value, self.linenos[item], self.colnos[item]))
+
+    def take(self, start: int, stop: int) -> Tuple[Tokenizer, ...]:
+        """
+        materialize the tokens in [start, stop) for the parser, which indexes each token
+        many times when backtracking.
+        """
+        source = self.source
+        names = self.names
+        plain = self._plain
+        name_ids = self.name_ids
+        starts = self.starts
+        ends = self.ends
+        linenos = self.linenos
+        colnos = self.colnos
+        tokens = []
+        append = tokens.append
+        for i in range(start, stop):
+            name_id = name_ids[i]
+            value = source[starts[i]:ends[i]]
+            append(
+                _new_token(Tokenizer, (names[name_id], value if plain[name_id] else cast(value),
+                                       linenos[i], colnos[i])))
+        return tuple(tokens)
+
+
+class TokenView(Sequence):
+    """
+    the tokens in [start, stop) of a `TokenStore`, without copying them.
+    """
+    __slots__ = ('store', 'start', 'stop')
+
+    def __init__(self, store: TokenStore, start: int, stop: int):
+        self.store = store
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            return self.store[self.start + start:self.start + max(start, stop):step]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self.store[self.start + item]
+
+    def materialize(self) -> Tuple[Tokenizer, ...]:
+        return self.store.take(self.start, self.stop)
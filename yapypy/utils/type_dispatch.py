@@ -0,0 +1,98 @@
+"""
+single dispatch on the type of the first argument, for the AST visitors.
+
+Unlike `Redy.Magic.Pattern`, which calls a function computing the case and then looks
+the case up for every call, the handler of each concrete type is looked up once
+through its MRO and then found with a single dict lookup.
+"""
+import inspect
+import typing as t
+
+__all__ = ['type_dispatch']
+
+
+def type_dispatch(func: t.Callable) -> t.Callable:
+    """
+    a function calling the handler registered by `case` for the type of its first
+    argument, or else for the nearest base of that type. `func` only gives its name
+    and doc. The handler found for each concrete type is cached until the next `case`.
+
+    title: type dispatch
+    test:
+    >>> from yapypy.utils.type_dispatch import type_dispatch
+    >>> @type_dispatch
+    >>> def show(x, suffix):
+    >>>     return type(x)
+    >>> @show.case(int)
+    >>> def show(x, suffix):
+    >>>     return f'int {x}{suffix}'
+    >>> assert show(1, '!') == 'int 1!' and show(True, '?') == 'int True?'
+    >>> try:
+    >>>     show('s', '')
+    >>>     assert False
+    >>> except TypeError:
+    >>>     pass
+    >>> @show.case(bool)
+    >>> def show_bool(x, suffix):
+    >>>     return f'bool {x}'
+    >>> @show.case(object)
+    >>> def show(x, suffix):
+    >>>     return 'any'
+    >>> assert show(True, '?') == 'bool True' and show('s', '') == 'any'
+    >>> assert show_bool is show.handlers[bool] and show.handlers[int](2, '') == 'int 2'
+    >>> @type_dispatch
+    >>> def size(x, *rest):
+    >>>     return type(x)
+    >>> size.case(str)(lambda x, *rest: len(x) + len(rest))
+    >>> assert size('ab', 1, 2) == 4
+    """
+    handlers = {}
+    resolved = {}
+
+    def resolve(cls: type):
+        for base in cls.__mro__:
+            handler = handlers.get(base)
+            if handler is not None:
+                resolved[cls] = handler
+                return handler
+        raise TypeError(f'Unknown entry for case {cls}.')
+
+    arg_info = inspect.getfullargspec(func)
+    if arg_info.defaults or arg_info.kwonlyargs or arg_info.varkw or arg_info.varargs:
+
+        def dispatch(node, *args, **kwargs):
+            try:
+                handler = resolved[node.__class__]
+            except KeyError:
+                handler = resolve(node.__class__)
+            return handler(node, *args, **kwargs)
+    else:
+        # packing the arguments costs more than the lookup, the dispatcher is generated
+        # with the signature of `func`.
+        args = ', '.join(arg_info.args)
+        node = arg_info.args[0]
+        scope = {'_resolved': resolved, '_resolve': resolve}
+        exec(f"def dispatch({args}):\n"
+             f"    try:\n"
+             f"        handler = _resolved[{node}.__class__]\n"
+             f"    except KeyError:\n"
+             f"        handler = _resolve({node}.__class__)\n"
+             f"    return handler({args})\n", scope)
+        dispatch = scope['dispatch']
+
+    def case(cls: type):
+
+        def register(handler):
+            handlers[cls] = handler
+            resolved.clear()
+            # the handlers named after the dispatcher keep the name bound to it.
+            return dispatch if handler.__name__ == dispatch.__name__ else handler
+
+        return register
+
+    dispatch.__name__ = func.__name__
+    dispatch.__qualname__ = func.__qualname__
+    dispatch.__doc__ = func.__doc__
+    dispatch.case = dispatch.match = case
+    dispatch.handlers = handlers
+    return dispatch
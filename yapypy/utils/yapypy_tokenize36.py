@@ -732,6 +732,290 @@ def _tokenize(readline, encoding):
 def generate_tokens(readline):
     return _tokenize(readline, None)
 
+
+# Precompiled patterns of the fast path. `_FastPseudoToken` matches exactly what
+#  `PseudoToken` matches, the named group closed last tells which alternative
+#  matched so that the common tokens need no further classification.
+_FastPseudoToken = Whitespace + ('(?:(?P<extra>' + PseudoExtras + ')|(?P<number>' + Number +
+                                 ')|(?P<funny>' + Funny + ')|(?P<contstr>' + ContStr +
+                                 ')|(?P<name>' + Name + '))')
+_fast_pseudoprog = _compile(_FastPseudoToken)
+_fast_endprogs = {prefix: _compile(pattern) for prefix, pattern in endpats.items()}
+_fast_indent = _compile(r'[ \t\f]*')
+
+
+def _split_lines(source):
+    # like `io.StringIO(source).readline`, lines are only broken at '\n'.
+    lines = source.split('\n')
+    last = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def generate_tokens_from_source(source):
+    """
+    The fast path of `generate_tokens(io.StringIO(source).readline)`, yielding the same
+    `TokenInfo` tuples, for a source which is already a str.
+
+    title: fast path tokenizer
+    test:
+    >>> import io
+    >>> from yapypy.utils.yapypy_tokenize36 import generate_tokens, generate_tokens_from_source
+    >>> src = "def f(a):\\n    return a\\nx = '''\\n''' # c\\n  # d\\n"
+    >>> expected = list(generate_tokens(io.StringIO(src).readline))
+    >>> assert list(generate_tokens_from_source(src)) == expected
+    """
+    make_token = tuple.__new__
+    pseudo_match = _fast_pseudoprog.match
+    indent_match = _fast_indent.match
+    lines = _split_lines(source)
+    lines.append('')
+    lnum = parenlev = continued = 0
+    contstr, needcont = '', 0
+    contline = None
+    indents = [0]
+
+    # 'stashed' and 'async_*' are used for async/await parsing
+    stashed = None
+    async_def = False
+    async_def_indent = 0
+    async_def_nl = False
+
+    for line in lines:                         # loop over lines in source
+        lnum += 1
+        pos, max = 0, len(line)
+
+        if contstr:                            # continued string
+            if not line:
+                raise TokenError("EOF in multi-line string", strstart)
+            endmatch = endprog.match(line)
+            if endmatch:
+                pos = end = endmatch.end(0)
+                yield make_token(TokenInfo, (STRING, contstr + line[:end],
+                       strstart, (lnum, end), contline + line))
+                contstr, needcont = '', 0
+                contline = None
+            elif needcont and line[-2:] != '\\\n' and line[-3:] != '\\\r\n':
+                yield make_token(TokenInfo, (ERRORTOKEN, contstr + line,
+                           strstart, (lnum, len(line)), contline))
+                contstr = ''
+                contline = None
+                continue
+            else:
+                contstr = contstr + line
+                contline = contline + line
+                continue
+
+        elif parenlev == 0 and not continued:  # new statement
+            if not line: break
+            pos = indent_match(line).end()     # measure leading whitespace
+            column = pos
+            if '\t' in line[:pos] or '\f' in line[:pos]:
+                column = 0
+                for char in line[:pos]:
+                    if char == ' ':
+                        column += 1
+                    elif char == '\t':
+                        column = (column//tabsize + 1)*tabsize
+                    else:
+                        column = 0
+            if pos == max:
+                break
+
+            if line[pos] in '#\r\n':           # skip comments or blank lines
+                if line[pos] == '#':
+                    comment_token = line[pos:].rstrip('\r\n')
+                    nl_pos = pos + len(comment_token)
+                    yield make_token(TokenInfo, (COMMENT, comment_token,
+                           (lnum, pos), (lnum, pos + len(comment_token)), line))
+                    yield make_token(TokenInfo, (NL, line[nl_pos:],
+                           (lnum, nl_pos), (lnum, len(line)), line))
+                else:
+                    yield make_token(TokenInfo, ((NL, COMMENT)[line[pos] == '#'], line[pos:],
+                           (lnum, pos), (lnum, len(line)), line))
+                continue
+
+            if column > indents[-1]:           # count indents or dedents
+                indents.append(column)
+                yield make_token(TokenInfo, (INDENT, line[:pos], (lnum, 0), (lnum, pos), line))
+            while column < indents[-1]:
+                if column not in indents:
+                    raise IndentationError(
+                        "unindent does not match any outer indentation level",
+                        ("<tokenize>", lnum, pos, line))
+                indents = indents[:-1]
+
+                if async_def and async_def_indent >= indents[-1]:
+                    async_def = False
+                    async_def_nl = False
+                    async_def_indent = 0
+
+                yield make_token(TokenInfo, (DEDENT, '', (lnum, pos), (lnum, pos), line))
+
+            if async_def and async_def_nl and async_def_indent >= indents[-1]:
+                async_def = False
+                async_def_nl = False
+                async_def_indent = 0
+
+        else:                                  # continued statement
+            if not line:
+                raise TokenError("EOF in multi-line statement", (lnum, 0))
+            continued = 0
+
+        while pos < max:
+            pseudomatch = pseudo_match(line, pos)
+            if pseudomatch:                                # scan for tokens
+                start, end = pseudomatch.span(pseudomatch.lastindex)
+                spos, epos, pos = (lnum, start), (lnum, end), end
+                if start == end:
+                    continue
+                token, initial = line[start:end], line[start]
+                kind = pseudomatch.lastgroup
+
+                if kind == 'name' and initial.isidentifier():  # ordinary name
+                    if token in ('async', 'await'):
+                        if async_def:
+                            yield make_token(TokenInfo, (
+                                ASYNC if token == 'async' else AWAIT,
+                                token, spos, epos, line))
+                            continue
+
+                    tok = make_token(TokenInfo, (NAME, token, spos, epos, line))
+                    if token == 'async' and not stashed:
+                        stashed = tok
+                        continue
+
+                    if token == 'def':
+                        if (stashed
+                                and stashed.type == NAME
+                                and stashed.string == 'async'):
+
+                            async_def = True
+                            async_def_indent = indents[-1]
+
+                            yield make_token(TokenInfo, (ASYNC, stashed.string,
+                                            stashed.start, stashed.end,
+                                            stashed.line))
+                            stashed = None
+
+                    if stashed:
+                        yield stashed
+                        stashed = None
+
+                    yield tok
+
+                elif kind == 'funny':
+                    if stashed:
+                        yield stashed
+                        stashed = None
+                    if initial in '\r\n':
+                        if parenlev > 0:
+                            yield make_token(TokenInfo, (NL, token, spos, epos, line))
+                        else:
+                            yield make_token(TokenInfo, (NEWLINE, token, spos, epos, line))
+                            if async_def:
+                                async_def_nl = True
+                    else:
+                        if initial in '([{':
+                            parenlev += 1
+                        elif initial in ')]}':
+                            parenlev -= 1
+                        yield make_token(TokenInfo, (OP, token, spos, epos, line))
+
+                elif kind == 'number':                     # ordinary number
+                    yield make_token(TokenInfo, (NUMBER, token, spos, epos, line))
+
+                elif initial == '#':
+                    assert not token.endswith("\n")
+                    if stashed:
+                        yield stashed
+                        stashed = None
+                    yield make_token(TokenInfo, (COMMENT, token, spos, epos, line))
+
+                elif token in triple_quoted:
+                    endprog = _fast_endprogs[token]
+                    endmatch = endprog.match(line, pos)
+                    if endmatch:                           # all on one line
+                        pos = endmatch.end(0)
+                        token = line[start:pos]
+                        yield make_token(TokenInfo, (STRING, token, spos, (lnum, pos), line))
+                    else:
+                        strstart = (lnum, start)           # multiple lines
+                        contstr = line[start:]
+                        contline = line
+                        break
+
+                elif (initial in single_quoted or
+                      token[:2] in single_quoted or
+                      token[:3] in single_quoted):
+                    if token[-1] == '\n':                  # continued string
+                        strstart = (lnum, start)
+                        endprog = (_fast_endprogs.get(initial) or
+                                   _fast_endprogs.get(token[1]) or
+                                   _fast_endprogs.get(token[2]))
+                        contstr, needcont = line[start:], 1
+                        contline = line
+                        break
+                    else:                                  # ordinary string
+                        yield make_token(TokenInfo, (STRING, token, spos, epos, line))
+
+                elif initial.isidentifier():               # ordinary name
+                    if token in ('async', 'await'):
+                        if async_def:
+                            yield make_token(TokenInfo, (
+                                ASYNC if token == 'async' else AWAIT,
+                                token, spos, epos, line))
+                            continue
+
+                    tok = make_token(TokenInfo, (NAME, token, spos, epos, line))
+                    if token == 'async' and not stashed:
+                        stashed = tok
+                        continue
+
+                    if token == 'def':
+                        if (stashed
+                                and stashed.type == NAME
+                                and stashed.string == 'async'):
+
+                            async_def = True
+                            async_def_indent = indents[-1]
+
+                            yield make_token(TokenInfo, (ASYNC, stashed.string,
+                                            stashed.start, stashed.end,
+                                            stashed.line))
+                            stashed = None
+
+                    if stashed:
+                        yield stashed
+                        stashed = None
+
+                    yield tok
+                elif initial == '\\':                      # continued stmt
+                    continued = 1
+                else:
+                    if initial in '([{':
+                        parenlev += 1
+                    elif initial in ')]}':
+                        parenlev -= 1
+                    if stashed:
+                        yield stashed
+                        stashed = None
+                    yield make_token(TokenInfo, (OP, token, spos, epos, line))
+            else:
+                yield make_token(TokenInfo, (ERRORTOKEN, line[pos],
+                           (lnum, pos), (lnum, pos+1), line))
+                pos += 1
+
+    if stashed:
+        yield stashed
+        stashed = None
+
+    for indent in indents[1:]:                 # pop remaining indent levels
+        yield make_token(TokenInfo, (DEDENT, '', (lnum, 0), (lnum, 0), ''))
+    yield make_token(TokenInfo, (ENDMARKER, '', (lnum, 0), (lnum, 0), ''))
+
 def main():
     import argparse
 